@@ -0,0 +1,187 @@
+'''
+@author: Jack Charles   https://jackcharlesconsulting.com/
+'''
+
+import os
+import sys
+import csv
+import glob
+import json
+import argparse
+import subprocess
+import concurrent.futures
+import calcs.sand_analysis as saan
+
+summary_columns = ['File', 'Name', 'Depth', 'd10', 'd50', 'UC', 'Sorting', 'Constien Criteria', 'Recommended Proppant', 'Recommended Screen']
+
+#databases are loaded once per worker process by _init_worker
+screen_dictionary:dict = {}
+proppant_dictionary:dict = {}
+
+def _init_worker(screen_database_filename:str, proppant_database_filename:str, profile:bool=False):
+    global screen_dictionary, proppant_dictionary
+    screen_dictionary = saan.import_screen_data(screen_database_filename)
+    proppant_dictionary = saan.import_proppant_data(proppant_database_filename)
+    if profile:
+        saan.enable_profiling()
+
+def find_sieve_files(paths:list[str]):
+    #directories are searched for .txt and .csv files, anything else is treated as a glob pattern
+    sieve_files = set()
+    for _path in paths:
+        if os.path.isdir(_path):
+            for _extension in ('*.txt', '*.csv'):
+                sieve_files.update(glob.glob(os.path.join(_path, _extension)))
+        else:
+            sieve_files.update(glob.glob(_path))
+    return sorted(sieve_files)
+
+def group_sieve_files(sieve_files:list[str], chunk_bytes:int):
+    #consecutive small files are grouped into one task of up to chunk_bytes, large files get a task of their own
+    groups, _group, _group_bytes = [], [], 0
+    for _file in sieve_files:
+        _bytes = os.path.getsize(_file)
+        if _group and _group_bytes + _bytes > chunk_bytes:
+            groups.append(_group)
+            _group, _group_bytes = [], 0
+        _group.append(_file)
+        _group_bytes += _bytes
+    if _group:
+        groups.append(_group)
+    return groups
+
+def output_names(sieve_files:list[str]):
+    #path of each file relative to the directory common to all of them, extension included, so a.txt and a.csv or
+    #two a.txt in different directories get different outputs. names that still collide are rejected
+    _common = os.path.commonpath([os.path.dirname(os.path.abspath(_file)) for _file in sieve_files]) if sieve_files else ''
+    names = [os.path.relpath(os.path.abspath(_file), _common).replace(os.sep, '__') for _file in sieve_files]
+    _duplicates = sorted(set(_name for _name in names if names.count(_name) > 1))
+    if _duplicates:
+        raise ValueError(f"Sieve files would write the same outputs: {_duplicates}")
+    return names
+
+def analyze_sieve_file(sieve_data_filename:str, output_name:str, output_dir:str, sieve_unit:str, selected_screens:list, selected_proppants:list,
+                       plot_formats:list=()):
+    #import, calculate and save one sieve file as output_name.json, returning its rows of the merged summary
+    sieve_data = saan.import_sieve_data(sieve_data_filename, as_dataset=True)
+    saan.calculate_sieve_results(sieve_unit, sieve_data, proppant_dictionary, selected_proppants[0] if selected_proppants else None)
+    save_filename = os.path.join(output_dir, output_name + '.json')
+    saan.write_saved_file_json(sieve_unit, sieve_data, selected_screens, selected_proppants, save_filename)
+    for _format in plot_formats:
+        saan.render_plots(sieve_data, proppant_dictionary, screen_dictionary, selected_screens, selected_proppants,
+                          os.path.splitext(save_filename)[0] + '.' + _format, max_curves=1000, shade=True)
+    selection = saan.calculate_selection_matrix(sieve_data, proppant_dictionary, screen_dictionary)
+    results = sieve_data.results
+    return [[output_name, _name, sieve_data.depths[_i].item(), results['d10'][_i].item(), results['d50'][_i].item(),
+             results['uniformity_coeff'][_i].item(), results['sorting_factor'][_i].item(), results['constien_criteria'][_i].item(),
+             selection['recommended_proppant'][_i], selection['recommended_screen'][_i]] for _i, _name in enumerate(sieve_data.keys())]
+
+def analyze_sieve_file_group(sieve_files:list[str], names:list[str], output_dir:str, sieve_unit:str, selected_screens:list, selected_proppants:list,
+                             plot_formats:list=()):
+    #returns the rows of each file, the files that failed with their error, and the profile of this task, which is empty
+    #unless profiling is enabled in the worker. a failed file does not stop the rest of the group
+    saan.reset_profiling()
+    rows, failed = [], []
+    for _file, _name in zip(sieve_files, names):
+        try:
+            rows.append(analyze_sieve_file(_file, _name, output_dir, sieve_unit, selected_screens, selected_proppants, plot_formats))
+        except (OSError, ValueError, IndexError) as error:
+            failed.append([_name, str(error)])
+    return rows, failed, saan.get_profile_report()
+
+def run_batch(sieve_files:list[str], output_dir:str, screen_database_filename:str, proppant_database_filename:str,
+              sieve_unit:str='micron', selected_screens:list=None, selected_proppants:list=None, workers:int=None, chunk_bytes:int=1000000,
+              plot_formats:list=(), profile:bool=False):
+    #summary rows are collected in input file order, so the output does not depend on the number of workers.
+    #with profile the stage timings of all workers are merged into profile.json. files that fail are listed in summary.json
+    selected_screens = selected_screens or []
+    selected_proppants = selected_proppants or []
+    names = dict(zip(sieve_files, output_names(sieve_files)))
+    os.makedirs(output_dir, exist_ok=True)
+    groups = group_sieve_files(sieve_files, chunk_bytes)
+    summary, failed, reports = [], [], []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(screen_database_filename, proppant_database_filename, profile)) as executor:
+        futures = [executor.submit(analyze_sieve_file_group, _group, [names[_file] for _file in _group], output_dir, sieve_unit, selected_screens,
+                                   selected_proppants, plot_formats) for _group in groups]
+        for _future in futures:
+            _group_rows, _failed, _report = _future.result()
+            for _rows in _group_rows:
+                summary.extend(_rows)
+            failed.extend(_failed)
+            reports.append(_report)
+    if profile:
+        with open(os.path.join(output_dir, 'profile.json'), 'w',) as file:
+            json.dump(saan.merge_profile_reports(reports), file, indent=2)
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(summary_columns)
+        writer.writerows(summary)
+    with open(os.path.join(output_dir, 'summary.json'), 'w',) as file:
+        json.dump({'Sieve Units': sieve_unit, 'Selected Screen': selected_screens, 'Selected Proppant': selected_proppants,
+                   'Files': [names[_file] for _file in sieve_files],
+                   'Failed': [{'File': _name, 'Error': _error} for _name, _error in failed],
+                   'Summary': [dict(zip(summary_columns, _row)) for _row in summary]}, file)
+    return summary, failed, saan.merge_profile_reports(reports)
+
+#modules that must not be imported by the calculation-only path
+lazy_modules = ('matplotlib', 'matplotlib.pyplot')
+
+def check_import_budget(budget_seconds:float):
+    #imports calcs.sand_analysis in a fresh interpreter, returns the import time and the lazy modules it pulled in
+    _code = ("import sys, time, json; _t = time.perf_counter(); import calcs.sand_analysis; _t = time.perf_counter() - _t; "
+             f"print(json.dumps([_t, [_x for _x in {lazy_modules!r} if _x in sys.modules]]))")
+    import_time, loaded_modules = json.loads(subprocess.run([sys.executable, '-c', _code], capture_output=True, text=True, check=True).stdout)
+    return import_time <= budget_seconds and not loaded_modules, import_time, loaded_modules
+
+def main(argv:list[str]=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or glob of sand sieve files without the interactive menu")
+    parser.add_argument('paths', nargs='*', help="sieve files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', default='batch_results')
+    parser.add_argument('--screen-database', default='util/database_screen.json')
+    parser.add_argument('--proppant-database', default='util/database_proppant.json')
+    parser.add_argument('--unit', default='micron', help="micron, mm, in, phi, mesh")
+    parser.add_argument('--screen', action='append', default=[], help="selected screen, may be repeated")
+    parser.add_argument('--proppant', action='append', default=[], help="selected proppant, may be repeated. the first is used for the Constien criterion")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes, defaults to the number of CPUs")
+    parser.add_argument('--chunk-bytes', type=int, default=1000000, help="small files are grouped into tasks of about this size")
+    parser.add_argument('--plot-format', action='append', default=[], choices=['png', 'svg', 'pdf'],
+                        help="also render the plots of each file headless in this format, may be repeated")
+    parser.add_argument('--profile', action='store_true', help="record per-stage timings in all workers, print them and write profile.json")
+    parser.add_argument('--check-import-budget', type=float, metavar='SECONDS',
+                        help="only check that importing the calculation path takes under SECONDS and does not load matplotlib")
+    args = parser.parse_args(argv)
+
+    if args.check_import_budget is not None:
+        within_budget, import_time, loaded_modules = check_import_budget(args.check_import_budget)
+        print(f"Import time {import_time:.3f} s (budget {args.check_import_budget:.3f} s), heavy modules loaded: {loaded_modules}")
+        sys.exit(0 if within_budget else 1)
+
+    sieve_files = find_sieve_files(args.paths)
+    if not sieve_files:
+        parser.error("no sieve files found")
+    #selected names are checked here, a misspelled proppant would otherwise give a Constien criterion of 0 or fail every plot
+    for _names, _database_filename, _import in ((args.screen, args.screen_database, saan.import_screen_data),
+                                                (args.proppant, args.proppant_database, saan.import_proppant_data)):
+        try:
+            _catalog = _import(_database_filename)
+        except (OSError, ValueError) as error:
+            parser.error(f"could not read {_database_filename}: {error}")
+        _unknown = [_name for _name in _names if _name not in _catalog]
+        if _unknown:
+            parser.error(f"{_unknown} not found in {_database_filename}")
+    try:
+        summary, failed, profile_report = run_batch(sieve_files, args.output_dir, args.screen_database, args.proppant_database, args.unit,
+                                                    args.screen, args.proppant, args.workers, args.chunk_bytes, args.plot_format, args.profile)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Analyzed {len(summary)} samples from {len(sieve_files) - len(failed)} files into {args.output_dir}")
+    for _name, _error in failed:
+        print(f"Could not analyze {_name}: {_error}")
+    if args.profile:
+        saan.print_profile_report(profile_report)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
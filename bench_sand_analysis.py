@@ -0,0 +1,160 @@
+'''
+@author: Jack Charles   https://jackcharlesconsulting.com/
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import calcs.sand_analysis as saan
+
+#sieve sizes of sand_analysis_default_sievefile.txt, in microns
+default_sieve_sizes = [8000, 4000, 3360, 2830, 2380, 2000, 1680, 1410, 1190, 1000, 850, 710, 600, 500, 420, 350, 297, 250, 210, 177, 149,
+                       125, 105, 88, 74, 62, 53, 44, 37, 31, 26, 22, 19, 16, 13, 11, 9.3, 7.8, 6.2, 5.5, 4.6, 3.9, 3.3, 2.8, 2.3, 1.9, 1.6, 1.4]
+
+def synthetic_sieve_sizes(sieve_set:int, bins:int):
+    #sieve set 0 is the default sieve sizes thinned to bins, later sets are shifted log-spaced meshes like another sieve shaker
+    if sieve_set == 0:
+        return [default_sieve_sizes[_i] for _i in np.unique(np.linspace(0, len(default_sieve_sizes) - 1, bins).astype(int))]
+    return np.round(np.geomspace(8000 / (1 + 0.1 * sieve_set), 1.4, bins), 2).tolist()
+
+def generate_sieve_file(sieve_data_filename:str, samples:int, sieve_sizes:list[float], first_sample:int=0, seed:int=0):
+    #log-normal grain size distributions with random d50 and sorting plus a fines tail, in the sieve file layout
+    _random = np.random.default_rng(seed)
+    _log_sizes = np.log(sieve_sizes)
+    _d50 = _random.normal(np.log(150), 0.4, (samples, 1))
+    _spread = _random.uniform(0.4, 1.0, (samples, 1))
+    retained = np.exp(-0.5 * ((_log_sizes[None, :] - _d50) / _spread) ** 2) + _random.uniform(0, 0.05, (samples, len(sieve_sizes))) * (_log_sizes < np.log(62))
+    retained = 100 * retained / retained.sum(axis=1, keepdims=True)
+    depths = 20000 + 0.25 * np.arange(first_sample, first_sample + samples)
+    with open(sieve_data_filename, 'w',) as file:
+        file.write('Sample,Depth,' + ','.join(f"{_size:g}" for _size in sieve_sizes) + '\n')
+        for _i in range(samples):
+            file.write(f"SYN{first_sample + _i:07d},{depths[_i]:.2f}," + ','.join(f"{_x:.5f}" for _x in retained[_i]) + '\n')
+
+def generate_sieve_files(data_dirname:str, samples:int, bins:int, sieve_sets:int, seed:int=0):
+    #samples are split evenly over one file per sieve set
+    sieve_files = []
+    for _set in range(sieve_sets):
+        _first = samples * _set // sieve_sets
+        sieve_files.append(os.path.join(data_dirname, f"synthetic_{_set}.txt"))
+        generate_sieve_file(sieve_files[-1], samples * (_set + 1) // sieve_sets - _first, synthetic_sieve_sizes(_set, bins), _first, seed + _set)
+    return sieve_files
+
+def measure(run, setup=None, memory:bool=True, repeats:int=5):
+    #best wall time of run(setup()) over repeats runs, each on a fresh setup(), and its peak traced memory in a separate run
+    #so tracing does not skew the time. the minimum is the least noisy estimate, the median is kept for reference
+    wall_times = []
+    for _repeat in range(max(1, repeats)):
+        _argument = setup() if setup else None
+        _start = time.perf_counter()
+        run(_argument)
+        wall_times.append(time.perf_counter() - _start)
+    peak_memory = None
+    if memory:
+        _argument = setup() if setup else None
+        tracemalloc.start()
+        run(_argument)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'wall_time_s': min(wall_times), 'median_wall_time_s': float(np.median(wall_times)), 'repeats': len(wall_times),
+            'peak_memory_bytes': peak_memory}
+
+def run_benchmarks(samples:int, bins:int, sieve_sets:int, proppant_database_filename:str, screen_database_filename:str,
+                   plots:bool=True, memory:bool=True, seed:int=0, repeats:int=5):
+    proppant_dictionary = saan.import_proppant_data(proppant_database_filename)
+    screen_dictionary = saan.import_screen_data(screen_database_filename)
+    selected_proppant = next((_x for _x in proppant_dictionary if proppant_dictionary[_x]['D50_micron'] > 0), None)
+    with tempfile.TemporaryDirectory() as data_dirname:
+        sieve_files = generate_sieve_files(data_dirname, samples, bins, sieve_sets, seed)
+        json_filename = os.path.join(data_dirname, 'project.json')
+        npy_dirname = os.path.join(data_dirname, 'project')
+
+        def _import_dict(_x=None):
+            sieve_data = {}
+            for _file in sieve_files:
+                sieve_data.update(saan.import_sieve_data(_file))
+            return sieve_data
+        def _import_datasets(_x=None):
+            return [saan.import_sieve_data(_file, as_dataset=True) for _file in sieve_files]
+        def _calculated_dict():
+            return saan.calculate_sieve_results('micron', _import_dict(), proppant_dictionary, selected_proppant)
+        def _calculated_datasets():
+            return [saan.calculate_sieve_results('micron', _dataset, proppant_dictionary, selected_proppant) for _dataset in _import_datasets()]
+
+        stages = {}
+        stages['import'] = measure(_import_dict, memory=memory, repeats=repeats)
+        stages['import_dataset'] = measure(_import_datasets, memory=memory, repeats=repeats)
+        stages['calculate'] = measure(lambda _data: saan.calculate_sieve_results('micron', _data, proppant_dictionary, selected_proppant),
+                                      _import_dict, memory, repeats)
+        stages['calculate_dataset'] = measure(lambda _data: [saan.calculate_sieve_results('micron', _dataset, proppant_dictionary, selected_proppant)
+                                                             for _dataset in _data], _import_datasets, memory, repeats)
+        stages['save_json'] = measure(lambda _data: saan.write_saved_file_json('micron', _data, [], [selected_proppant], json_filename),
+                                      _calculated_dict, memory, repeats)
+        stages['load_json'] = measure(lambda _x: saan.read_saved_file_json(json_filename), memory=memory, repeats=repeats)
+        stages['save_npy'] = measure(lambda _data: saan.write_saved_file_npy('micron', _data, [], [selected_proppant], npy_dirname),
+                                     _calculated_dict, memory, repeats)
+        stages['load_npy'] = measure(lambda _x: saan.read_saved_file_npy(npy_dirname), memory=memory, repeats=repeats)
+        if plots:
+            plot_filename = os.path.join(data_dirname, 'plots.png')
+            stages['plot'] = measure(lambda _data: saan.render_plots(_data[0], proppant_dictionary, screen_dictionary, [], [selected_proppant],
+                                                                     plot_filename, max_curves=1000, shade=True), _calculated_datasets, memory, repeats)
+    return {'samples': samples, 'bins': bins, 'sieve_sets': sieve_sets, 'stages': stages}
+
+def compare_with_baseline(results:dict, baseline:dict, tolerance:float, min_difference:float=0.005):
+    #stages whose best wall time grew by more than tolerance (0.2 = 20%) over the baseline's best wall time, and by more than
+    #min_difference seconds, so millisecond stages are not flagged on timer noise
+    regressions = []
+    for _stage, _measured in results['stages'].items():
+        if _stage in baseline['stages']:
+            _ratio = _measured['wall_time_s'] / baseline['stages'][_stage]['wall_time_s']
+            _measured['baseline_ratio'] = _ratio
+            if _ratio > 1 + tolerance and _measured['wall_time_s'] - baseline['stages'][_stage]['wall_time_s'] > min_difference:
+                regressions.append(_stage)
+    return regressions
+
+def print_benchmarks(results:dict):
+    print(f"{results['samples']} samples, {results['bins']} bins, {results['sieve_sets']} sieve sets")
+    print(f"Stage\t\t\tBest (s)\tMedian (s)\tPeak Memory (MB)\tvs Baseline")
+    for _stage, _measured in results['stages'].items():
+        _memory = f"{_measured['peak_memory_bytes'] / 1e6:.1f}" if _measured['peak_memory_bytes'] is not None else '-'
+        _ratio = f"{_measured['baseline_ratio']:.2f}x" if 'baseline_ratio' in _measured else '-'
+        print(f"{_stage:<24}{_measured['wall_time_s']:.4f}\t\t{_measured['median_wall_time_s']:.4f}\t\t{_memory}\t\t\t{_ratio}")
+
+def main(argv:list[str]=None):
+    parser = argparse.ArgumentParser(description="Benchmark import, calculation, save/load and plotting on synthetic sieve data")
+    parser.add_argument('-n', '--samples', type=int, default=1000)
+    parser.add_argument('--bins', type=int, default=48, help="sieve sizes per sample")
+    parser.add_argument('--sieve-sets', type=int, default=2, help="number of different sieve sets mixed in the project")
+    parser.add_argument('--screen-database', default='util/database_screen.json')
+    parser.add_argument('--proppant-database', default='util/database_proppant.json')
+    parser.add_argument('--skip-plots', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced peak memory runs")
+    parser.add_argument('--repeats', type=int, default=5, help="timed runs per stage, the fastest is reported and compared")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a results file saved with --output")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown against the baseline, 0.2 = 20%%")
+    parser.add_argument('--min-difference', type=float, default=0.005, help="slowdowns of fewer seconds than this are never regressions")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.samples, args.bins, args.sieve_sets, args.proppant_database, args.screen_database,
+                             not args.skip_plots, not args.no_memory, args.seed, args.repeats)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r',) as file:
+            regressions = compare_with_baseline(results, json.load(file), args.tolerance, args.min_difference)
+    print_benchmarks(results)
+    if args.output:
+        with open(args.output, 'w',) as file:
+            json.dump(results, file, indent=2)
+    if regressions:
+        print(f"Regressions over {args.tolerance:.0%}: {regressions}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,7 @@
 @author: Jack Charles   https://jackcharlesconsulting.com/
 '''
 
-import math
-import json
-import numpy as np
-import matplotlib.pyplot as plt
-import util.wellengcalc as wec
+import os
 import calcs.sand_analysis as saan
 
 #initialize lists
@@ -36,20 +32,28 @@ while menu_loop != False:
                         "10: Perform Calculations\n"
                         "11: Print SRT Data\n"
                         "12: Plot Results\n"
+                        "13: Print Depth Interval Statistics\n"
+                        "14: Enable/Disable Profiling\n"
+                        "15: Print Profiling Report\n"
                         "20: Save File\n"
+                        "21: Save Binary Project\n"
                         "0: Quit\n"
                         "Selection: "))
 
     if menu_selection == 1:
         sieve_data_filename = input("Path to Sand Sieve Data: ")
         try:
+            srt_results = dict(srt_results)     #a binary project opens as a read-only SieveDataset
             srt_results.update(saan.import_sieve_data(sieve_data_filename))
         except FileNotFoundError:
             print("File not found")
     elif menu_selection == 2: 
         sieve_data_filename = input("Path to Saved File: ")
         try:
-            sieve_unit, srt_results, selected_screens, selected_proppants = saan.read_saved_file_json(sieve_data_filename)
+            if os.path.isdir(sieve_data_filename):
+                sieve_unit, srt_results, selected_screens, selected_proppants = saan.read_saved_file_npy(sieve_data_filename)
+            else:
+                sieve_unit, srt_results, selected_screens, selected_proppants = saan.read_saved_file_json(sieve_data_filename)
         except FileNotFoundError:
             print("File not found")
     elif menu_selection == 3:
@@ -67,7 +71,7 @@ while menu_loop != False:
     elif menu_selection == 5: 
         selected_screens.clear()
         selected_proppants.clear()
-        srt_results.clear()
+        srt_results = {}
         print("Sieve Data and Selections Cleared")
     elif menu_selection == 6:
         print(f"Available Screens: ",[f"{screen_dictionary[_x].name}" for _x in screen_dictionary],"\t")
@@ -87,9 +91,26 @@ while menu_loop != False:
         saan.print_sieve_analysis(srt_results)
     elif menu_selection == 12:
         saan.show_plots(srt_results, proppant_dictionary, screen_dictionary, selected_screens, selected_proppants)
+    elif menu_selection == 13:
+        top_depth = float(input("Top Depth: "))
+        bottom_depth = float(input("Bottom Depth: "))
+        bin_size = float(input("Interval Size: "))
+        saan.print_interval_statistics(saan.DepthIndex(srt_results).aggregate(top_depth, bottom_depth, bin_size))
+    elif menu_selection == 14:
+        if saan.profiling_enabled():
+            saan.disable_profiling()
+            print("Profiling disabled")
+        else:
+            saan.enable_profiling()
+            print("Profiling enabled")
+    elif menu_selection == 15:
+        saan.print_profile_report()
     elif menu_selection == 20: 
         sieve_data_filename = input("Filename to Save To: ")
         saan.write_saved_file_json(sieve_unit, srt_results, selected_screens, selected_proppants, sieve_data_filename)
+    elif menu_selection == 21: 
+        sieve_data_filename = input("Directory to Save To: ")
+        saan.write_saved_file_npy(sieve_unit, srt_results, selected_screens, selected_proppants, sieve_data_filename)
     elif menu_selection == 0:
         print("Thank you")
         menu_loop = False
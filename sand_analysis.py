@@ -2,16 +2,86 @@
 @author: Jack Charles   https://jackcharlesconsulting.com/
 '''
 
-import math
+import os
 import json
+import time
+import itertools
 import numpy as np
-import matplotlib.pyplot as plt
-import util.wellengcalc as wec
 
 #units in microns. made as a dictionary for lookup
 wentworth_sand_classification = {'Clay': 3.9, 'Silt': 62.0, 'VFG Sand': 125.0, 'FG Sand': 250.0, 'MG Sand': 500.0, 'CG Sand': 1000.0, 'VCG Sand': 2000.0, 'Gravel': 4000.0}
 uniformity_classification = {'Highly Uniform': 3, 'Uniform': 5, 'Non-Uniform': 10, 'Highly Non-Uniform': 25}
 mobile_fines_classification = {5: 'Fines Immobile', 10: 'Impairment Increasing', 25: 'Impairment Decreasing', 250: 'Fines Produced'}
+sieve_percentages = [5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95]
+#proppant pack pore size = D50 / proppant_pack_pore_ratio, some solutions use 6
+proppant_pack_pore_ratio = 6.5
+#formation pore size = d50 / formation_pore_ratio, recommended gravel and frac pack D50 = d50 * ratio (frac packs up to 10)
+formation_pore_ratio = 6.5
+recommended_gravel_ratio = 6
+recommended_frac_ratio = 8
+#per-sample results produced by calculate_sieve_parameters, in the order the batch engine returns them
+sieve_result_fields = ('d5', 'd10', 'd40', 'd50', 'd90', 'd95', 'uniformity_coeff', 'sorting_factor', 'effective_size',
+                       'mobile_fines_coeff', 'mobile_fines_size', 'average_formation_pore', 'smallest_particle_to_bridge',
+                       'largest_particle_thru_pore', 'recommended_gravel_D50', 'recommended_frac_D50')
+#saved file keys for the results stored per sample
+saved_file_keys = {'d5': 'd5', 'd10': 'd10', 'd40': 'd40', 'd50': 'd50', 'd90': 'd90', 'd95': 'd95',
+                   'uniformity_coeff': 'UC', 'sorting_factor': 'Sorting', 'effective_size': 'Effective Size',
+                   'mobile_fines_coeff': 'Mobile Fines Coefficient', 'mobile_fines_size': 'Mobile Fines Size',
+                   'average_formation_pore': 'Average Formation Pore Size', 'smallest_particle_to_bridge': 'Smallest Particle to Bridge',
+                   'largest_particle_thru_pore': 'Largest Particle to Pass Through'}
+
+#opt-in per-stage instrumentation. None while disabled, so each instrumented stage only costs a global lookup
+_profile_stages:dict[str,dict] = None
+
+def enable_profiling():
+    global _profile_stages
+    if _profile_stages is None:
+        _profile_stages = {}
+
+def disable_profiling():
+    global _profile_stages
+    _profile_stages = None
+
+def reset_profiling():
+    if _profile_stages is not None:
+        _profile_stages.clear()
+
+def profiling_enabled():
+    return _profile_stages is not None
+
+def _profile_start():
+    return time.perf_counter() if _profile_stages is not None else None
+
+def _profile_stop(stage:str, start:float, samples:int=0, bytes_read:int=0, bytes_written:int=0, read_paths:list=(), written_paths:list=()):
+    #file sizes are only looked up while profiling is enabled
+    if start is None or _profile_stages is None:
+        return
+    _stage = _profile_stages.setdefault(stage, {'calls': 0, 'wall_time_s': 0.0, 'samples': 0, 'bytes_read': 0, 'bytes_written': 0})
+    _stage['calls'] += 1
+    _stage['wall_time_s'] += time.perf_counter() - start
+    _stage['samples'] += samples
+    _stage['bytes_read'] += bytes_read + sum(os.path.getsize(_path) for _path in read_paths)
+    _stage['bytes_written'] += bytes_written + sum(os.path.getsize(_path) for _path in written_paths)
+
+def get_profile_report():
+    #{stage: {calls, wall_time_s, samples, bytes_read, bytes_written}} for import, convert, calculate, constien, save, load and plot
+    return {_stage: dict(_values) for _stage, _values in (_profile_stages or {}).items()}
+
+def merge_profile_reports(reports:list[dict]):
+    #adds up reports, e.g. from worker processes
+    merged:dict[str,dict] = {}
+    for report in reports:
+        for _stage, _values in report.items():
+            _merged = merged.setdefault(_stage, {'calls': 0, 'wall_time_s': 0.0, 'samples': 0, 'bytes_read': 0, 'bytes_written': 0})
+            for _key in _merged:
+                _merged[_key] += _values[_key]
+    return merged
+
+def print_profile_report(report:dict=None):
+    report = get_profile_report() if report is None else report
+    print(f"Stage\t\tCalls\tTime (s)\tSamples\tBytes Read\tBytes Written")
+    for _stage, _values in report.items():
+        print(f"{_stage:<16}{_values['calls']}\t{_values['wall_time_s']:.4f}\t\t{_values['samples']}\t{_values['bytes_read']}\t\t{_values['bytes_written']}")
 
 class SandSieveData():
     def __init__(self, name:str, depth:float, sieve_sizes:list[float], retained:list[float], cumulative_wt_perc:list[float], 
@@ -37,11 +107,25 @@ class SandSieveData():
         self.average_formation_pore = average_formation_pore
         self.smallest_particle_to_bridge = smallest_particle_to_bridge
         self.largest_particle_thru_pore = largest_particle_thru_pore
+        #calculation state, so calculate_sieve_results only touches new or modified samples
+        self.raw_sieve_sizes = sieve_sizes
+        self.raw_sieve_unit = None          #None follows the unit selected at calculation, saved files are already in microns
+        self.converted_unit = None
+        self.calculated = False
+        self.constien_proppant = None
+
+    @property
+    def retained(self):
+        return self._retained
+
+    @retained.setter
+    def retained(self, value):
+        self._retained = value
+        self.calculated = False
 
     def calculate_sieve_parameters(self):
-        _percentages = [5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 95]
         self.depth = self.depth
-        grain_size_percent = np.interp(_percentages, self.cumulative_wt_perc, self.sieve_sizes)
+        grain_size_percent = np.interp(sieve_percentages, self.cumulative_wt_perc, self.sieve_sizes)
         self.d5 = grain_size_percent[0]
         self.d10 = grain_size_percent[1]
         self.d40 = grain_size_percent[4]
@@ -53,31 +137,261 @@ class SandSieveData():
         self.effective_size = self.d50 / self.uniformity_coeff
         self.mobile_fines_coeff = self.d50/self.d95
         self.mobile_fines_size = self.d50 / 10
-        self.average_formation_pore = self.d50 / 6.5          #or 6 - use a variable in next iteration
+        self.average_formation_pore = self.d50 / formation_pore_ratio
         self.smallest_particle_to_bridge = self.average_formation_pore / 3
         self.largest_particle_thru_pore = self.average_formation_pore / 7
-        self.recommended_gravel_D50 = self.d50 * 6
-        self.recommended_frac_D50 = self.d50 * 8              #or 10 - use a variable in next iteration
+        self.recommended_gravel_D50 = self.d50 * recommended_gravel_ratio
+        self.recommended_frac_D50 = self.d50 * recommended_frac_ratio
 
     def calculate_constien_criteria(self, proppant_pack_pore_size:float):
         self.constien_criteria = self.d50 / self.uniformity_coeff / proppant_pack_pore_size
 
-    def convert_sieve_sizes(self, sieve_unit):      #convert all to microns
+    def convert_sieve_sizes(self, sieve_unit):      #convert all to microns, always from the raw sizes so repeated calls do not rescale
+        sieve_unit = self.raw_sieve_unit or sieve_unit
+        if sieve_unit == self.converted_unit:
+            return
         if sieve_unit == 'micron':
-            self.sieve_sizes = [1 * _sizes for _sizes in self.sieve_sizes]
+            self.sieve_sizes = [1 * _sizes for _sizes in self.raw_sieve_sizes]
         elif sieve_unit == 'mm':
-            self.sieve_sizes = [1000 * _sizes for _sizes in self.sieve_sizes]
+            self.sieve_sizes = [1000 * _sizes for _sizes in self.raw_sieve_sizes]
         elif sieve_unit == 'in':
-            self.sieve_sizes = [25.4 * _sizes for _sizes in self.sieve_sizes]
+            self.sieve_sizes = [25.4 * _sizes for _sizes in self.raw_sieve_sizes]
         elif sieve_unit == 'phi':
-            self.sieve_sizes = [1000 * 2 ** -(_sizes) for _sizes in self.sieve_sizes]
+            self.sieve_sizes = [1000 * 2 ** -(_sizes) for _sizes in self.raw_sieve_sizes]
         elif sieve_unit == 'mesh':
-            self.sieve_sizes = [1 * _sizes for _sizes in self.sieve_sizes] #TO FIX
+            self.sieve_sizes = [1 * _sizes for _sizes in self.raw_sieve_sizes] #TO FIX
+        else:
+            self.sieve_sizes = list(self.raw_sieve_sizes)
+        self.converted_unit = sieve_unit
+        self.calculated = False
 
     def print_sieve_results(self):
         print(self.name,"\t",self.depth,"\t",[f"{_x:.2f}" for _x in self.retained],"\t",[f"{_y:.2f}" for _y in self.cumulative_wt_perc])
         print(f"{self.name}\t{self.depth}\td10={self.d10:.2f}\td50={self.d50:.2f}\tUniformity={self.uniformity_coeff:.2f}\tSorting={self.sorting_factor:.2f}")
 
+class SieveDataset():
+    #struct-of-arrays container for samples sharing one set of sieve sizes. behaves as a read-only dict[str,SandSieveData]
+    #whose values are lightweight views, so code written against srt_results works on it unchanged
+    def __init__(self, names:list[str], depths, sieve_sizes, retained, cumulative_wt_perc=None, results:dict=None):
+        self.names = np.asarray(names, dtype=str)
+        self.depths = np.asarray(depths, dtype=float)
+        self.sieve_sizes = np.asarray(sieve_sizes, dtype=float)
+        self.retained = np.asarray(retained, dtype=float).reshape(len(self.names), len(self.sieve_sizes))
+        if cumulative_wt_perc is None:
+            cumulative_wt_perc = np.zeros(self.retained.shape)
+        self.cumulative_wt_perc = np.asarray(cumulative_wt_perc, dtype=float)
+        self.results:dict[str,np.ndarray] = {}
+        for _field in sieve_result_fields + ('constien_criteria',):
+            self.results[_field] = np.zeros(len(self.names)) if results is None or _field not in results else np.asarray(results[_field], dtype=float)
+        self.raw_sieve_sizes = self.sieve_sizes
+        self.raw_sieve_unit = None
+        self.converted_unit = None
+        self.calculated = np.zeros(len(self.names), dtype=bool)
+        self.constien_proppant = np.full(len(self.names), None, dtype=object)
+        self._name_index = None
+
+    @classmethod
+    def from_sieve_data(cls, sieve_data:dict[str,SandSieveData]):
+        samples = list(sieve_data.values())
+        sieve_sizes = samples[0].sieve_sizes
+        if any(list(_sample.sieve_sizes) != list(sieve_sizes) for _sample in samples):
+            raise ValueError("All samples in a SieveDataset must share the same sieve sizes")
+        results = {_field: [getattr(_sample, _field, 0) for _sample in samples] for _field in sieve_result_fields + ('constien_criteria',)}
+        dataset = cls([_sample.name for _sample in samples], [_sample.depth for _sample in samples], sieve_sizes,
+                      [_sample.retained for _sample in samples],
+                      [_sample.cumulative_wt_perc if len(_sample.cumulative_wt_perc) else np.zeros(len(sieve_sizes)) for _sample in samples],
+                      results)
+        if samples[0].converted_unit is not None:       #sizes are already in microns
+            dataset.raw_sieve_unit = dataset.converted_unit = 'micron'
+        dataset.calculated[:] = [_sample.calculated for _sample in samples]
+        dataset.constien_proppant[:] = [_sample.constien_proppant for _sample in samples]
+        return dataset
+
+    @classmethod
+    def concatenate(cls, datasets:list):
+        datasets = list(datasets)
+        if not datasets:
+            raise ValueError("No datasets to concatenate, a SieveDataset needs at least one to take its sieve sizes from")
+        if any(not np.array_equal(_dataset.raw_sieve_sizes, datasets[0].raw_sieve_sizes) or _dataset.raw_sieve_unit != datasets[0].raw_sieve_unit
+               or _dataset.converted_unit != datasets[0].converted_unit for _dataset in datasets):
+            raise ValueError("All samples in a SieveDataset must share the same sieve sizes")
+        dataset = cls(np.concatenate([_dataset.names for _dataset in datasets]), np.concatenate([_dataset.depths for _dataset in datasets]),
+                      datasets[0].sieve_sizes, np.concatenate([_dataset.retained for _dataset in datasets]),
+                      np.concatenate([_dataset.cumulative_wt_perc for _dataset in datasets]),
+                      {_field: np.concatenate([_dataset.results[_field] for _dataset in datasets]) for _field in datasets[0].results})
+        dataset.raw_sieve_sizes = datasets[0].raw_sieve_sizes
+        dataset.raw_sieve_unit = datasets[0].raw_sieve_unit
+        dataset.converted_unit = datasets[0].converted_unit
+        dataset.calculated = np.concatenate([_dataset.calculated for _dataset in datasets])
+        dataset.constien_proppant = np.concatenate([_dataset.constien_proppant for _dataset in datasets])
+        return dataset
+
+    def append(self, other):
+        #returns a new dataset with the samples of other added, each row keeping its calculation state
+        return SieveDataset.concatenate([self, other])
+
+    def subset(self, rows):
+        #new dataset holding a copy of the selected rows, keeping their calculation state
+        dataset = SieveDataset(self.names[rows], self.depths[rows], self.sieve_sizes, self.retained[rows], self.cumulative_wt_perc[rows],
+                               {_field: self.results[_field][rows] for _field in self.results})
+        dataset.raw_sieve_sizes = self.raw_sieve_sizes
+        dataset.raw_sieve_unit = self.raw_sieve_unit
+        dataset.converted_unit = self.converted_unit
+        dataset.calculated = self.calculated[rows]
+        dataset.constien_proppant = self.constien_proppant[rows]
+        return dataset
+
+    def index_of(self, name:str):
+        if self._name_index is None:
+            self._name_index = {_name: _i for _i, _name in enumerate(self.names.tolist())}
+        return self._name_index[name]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, name):
+        try:
+            self.index_of(name)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, name:str):
+        return SandSieveDataView(self, self.index_of(name))
+
+    def keys(self):
+        return self.names.tolist()
+
+    def values(self):
+        return [SandSieveDataView(self, _i) for _i in range(len(self.names))]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+    def convert_sieve_sizes(self, sieve_unit):      #convert all to microns, once for the shared sieve sizes and always from the raw sizes
+        sieve_unit = self.raw_sieve_unit or sieve_unit
+        if sieve_unit == self.converted_unit:
+            return
+        if sieve_unit == 'mm':
+            self.sieve_sizes = 1000 * self.raw_sieve_sizes
+        elif sieve_unit == 'in':
+            self.sieve_sizes = 25.4 * self.raw_sieve_sizes
+        elif sieve_unit == 'phi':
+            self.sieve_sizes = 1000 * 2 ** -(self.raw_sieve_sizes)
+        else:
+            self.sieve_sizes = self.raw_sieve_sizes
+        self.converted_unit = sieve_unit
+        self.calculated[:] = False
+
+    def calculate(self, sieve_unit, proppant_pack_pore_size:float=None, selected_proppant:str=None, recalculate:bool=False):
+        #only rows that are new, modified or converted are recalculated. a new proppant only recalculates the Constien column
+        _start = _profile_start()
+        self.convert_sieve_sizes(sieve_unit)
+        _profile_stop('convert', _start, len(self.names))
+        if recalculate:
+            self.calculated[:] = False
+        if proppant_pack_pore_size is None:
+            selected_proppant = None
+        _start = _profile_start()
+        _rows = np.flatnonzero(~self.calculated)
+        if len(_rows):
+            results = calculate_sieve_batch(self.sieve_sizes, self.retained[_rows], proppant_pack_pore_size)
+            self.cumulative_wt_perc[_rows] = results.pop('cumulative_wt_perc')
+            for _field in results:
+                self.results[_field][_rows] = results[_field]
+            self.calculated[_rows] = True
+            self.constien_proppant[_rows] = selected_proppant
+        _profile_stop('calculate', _start, len(_rows))
+        _start = _profile_start()
+        _rows = np.flatnonzero(self.constien_proppant != selected_proppant)
+        if len(_rows):
+            self.results['constien_criteria'][_rows] = _constien_criteria(self.results['d50'][_rows], self.results['uniformity_coeff'][_rows], proppant_pack_pore_size)
+            self.constien_proppant[_rows] = selected_proppant
+        _profile_stop('constien', _start, len(_rows))
+
+class SandSieveDataView(SandSieveData):
+    #a single row of a SieveDataset with the SandSieveData attribute API. reads and writes go to the dataset arrays
+    def __init__(self, dataset:SieveDataset, index:int):
+        self._dataset = dataset
+        self._index = index
+
+    @property
+    def name(self):
+        return str(self._dataset.names[self._index])
+
+    @property
+    def depth(self):
+        return self._dataset.depths[self._index]
+
+    @depth.setter
+    def depth(self, value):
+        self._dataset.depths[self._index] = value
+
+    @property
+    def sieve_sizes(self):      #shared by all samples, convert through SieveDataset.convert_sieve_sizes
+        return self._dataset.sieve_sizes
+
+    @property
+    def raw_sieve_sizes(self):
+        return self._dataset.raw_sieve_sizes
+
+    @property
+    def raw_sieve_unit(self):
+        return self._dataset.raw_sieve_unit
+
+    @property
+    def converted_unit(self):
+        return self._dataset.converted_unit
+
+    def convert_sieve_sizes(self, sieve_unit):
+        self._dataset.convert_sieve_sizes(sieve_unit)
+
+    @property
+    def calculated(self):
+        return self._dataset.calculated[self._index]
+
+    @calculated.setter
+    def calculated(self, value):
+        self._dataset.calculated[self._index] = value
+
+    @property
+    def constien_proppant(self):
+        return self._dataset.constien_proppant[self._index]
+
+    @constien_proppant.setter
+    def constien_proppant(self, value):
+        self._dataset.constien_proppant[self._index] = value
+
+    @property
+    def retained(self):
+        return self._dataset.retained[self._index]
+
+    @retained.setter
+    def retained(self, value):
+        self._dataset.retained[self._index] = value
+        self._dataset.calculated[self._index] = False
+
+    @property
+    def cumulative_wt_perc(self):
+        return self._dataset.cumulative_wt_perc[self._index]
+
+    @cumulative_wt_perc.setter
+    def cumulative_wt_perc(self, value):
+        self._dataset.cumulative_wt_perc[self._index] = value
+
+def _dataset_result_property(field:str):
+    def _get(self):
+        return self._dataset.results[field][self._index]
+    def _set(self, value):
+        self._dataset.results[field][self._index] = value
+    return property(_get, _set)
+
+for _field in sieve_result_fields + ('constien_criteria',):
+    setattr(SandSieveDataView, _field, _dataset_result_property(_field))
+
 class ScreenData():
     def __init__(self, name:str, type:str, aperture:float):
         self.name = name
@@ -94,11 +408,75 @@ class ProppantData():
         self.D50 = D50
 
     def calculate_proppant_parameters(self):
-        self.proppant_pack_pore_size = self.D50 / 6.5                      #or 6 - use a variable in next iteration
+        self.proppant_pack_pore_size = self.D50 / proppant_pack_pore_ratio
         self.smallest_particle_to_bridge = self.proppant_pack_pore_size / 3
         self.largest_particle_thru_pore = self.proppant_pack_pore_size / 7
 
+class ScreenCatalog(dict):
+    #screen database keyed by name, with the apertures as an array in database order and sorted for binary search.
+    #build a new catalog after editing the entries
+    def __init__(self, screen_dictionary:dict):
+        super().__init__(screen_dictionary)
+        self.names = list(self.keys())
+        self.apertures = np.array([self[_x]['aperture_micron'] for _x in self.names], dtype=float)
+        self._order = np.argsort(self.apertures, kind='stable')
+        self._sorted_apertures = self.apertures[self._order]
+
+    def largest_below(self, d10):
+        #index of the largest aperture <= d10 for each value, -1 where no screen retains d10. ties go to the first screen in database order
+        d10 = np.asarray(d10, dtype=float)
+        if not len(self.names):
+            return np.full(d10.shape, -1)
+        _count = np.searchsorted(self._sorted_apertures, d10, side='right')
+        _first = np.searchsorted(self._sorted_apertures, self._sorted_apertures[np.maximum(_count - 1, 0)], side='left')
+        return np.where((_count > 0) & ~np.isnan(d10), self._order[_first], -1)
+
+    def in_aperture_range(self, low:float, high:float):
+        #names of the screens with low <= aperture <= high, smallest aperture first
+        return [self.names[_x] for _x in self._order[np.searchsorted(self._sorted_apertures, low, side='left'):
+                                                      np.searchsorted(self._sorted_apertures, high, side='right')]]
+
+class ProppantCatalog(dict):
+    #proppant database keyed by name. each entry gets the pack pore and bridging sizes of ProppantData.calculate_proppant_parameters,
+    #and the proppants with a D50 are kept as arrays in database order and sorted by D50 for binary search
+    def __init__(self, proppant_dictionary:dict):
+        super().__init__()
+        for key, _entry in proppant_dictionary.items():
+            _proppant = ProppantData(_entry['name'], _entry['permeability_D'], _entry['density_SG'], _entry['absvol_gal/lb'],
+                                     _entry['bulk_density_lb/ft3'], _entry['D50_micron'])
+            _proppant.calculate_proppant_parameters()
+            self[key] = {**_entry, 'pack_pore_micron': _proppant.proppant_pack_pore_size,
+                         'smallest_to_bridge_micron': _proppant.smallest_particle_to_bridge, 'largest_thru_pore_micron': _proppant.largest_particle_thru_pore}
+        self.names = [_x for _x in self if self[_x]['D50_micron'] > 0]
+        self.D50 = np.array([self[_x]['D50_micron'] for _x in self.names], dtype=float)
+        self.pack_pore_size = np.array([self[_x]['pack_pore_micron'] for _x in self.names], dtype=float)
+        self.smallest_to_bridge = np.array([self[_x]['smallest_to_bridge_micron'] for _x in self.names], dtype=float)
+        self.largest_thru_pore = np.array([self[_x]['largest_thru_pore_micron'] for _x in self.names], dtype=float)
+        self._order = np.argsort(self.D50, kind='stable')
+        self._sorted_D50 = self.D50[self._order]
+
+    def in_D50_range(self, low:float, high:float):
+        #names of the proppants with low <= D50 <= high, finest first
+        return [self.names[_x] for _x in self._order[np.searchsorted(self._sorted_D50, low, side='left'):
+                                                      np.searchsorted(self._sorted_D50, high, side='right')]]
+
+    def nearest_D50(self, D50):
+        #index of the proppant with the D50 closest to each value, the finer one on a tie
+        D50 = np.asarray(D50, dtype=float)
+        if not len(self.names):
+            return np.full(D50.shape, -1)
+        _i = np.searchsorted(self._sorted_D50, D50)
+        _lower, _upper = np.maximum(_i - 1, 0), np.minimum(_i, len(self.names) - 1)
+        return self._order[np.where(np.abs(D50 - self._sorted_D50[_lower]) <= np.abs(self._sorted_D50[_upper] - D50), _lower, _upper)]
+
+def _screen_catalog(screen_dictionary:dict):
+    return screen_dictionary if isinstance(screen_dictionary, ScreenCatalog) else ScreenCatalog(screen_dictionary)
+
+def _proppant_catalog(proppant_dictionary:dict):
+    return proppant_dictionary if isinstance(proppant_dictionary, ProppantCatalog) else ProppantCatalog(proppant_dictionary)
+
 def read_saved_file_json(data_filename:str):
+    _start = _profile_start()
     with open(data_filename, 'r',) as file:
         data_dictionary = json.load(file)
     sieve_data:dict[str,SandSieveData] = {}
@@ -112,29 +490,235 @@ def read_saved_file_json(data_filename:str):
                                         _dd[key]['Mobile Fines Coefficient'], _dd[key]['Mobile Fines Size'], 
                                         _dd[key]['Average Formation Pore Size'], _dd[key]['Smallest Particle to Bridge'], 
                                         _dd[key]['Largest Particle to Pass Through'])
+        sieve_data[key].raw_sieve_unit = sieve_data[key].converted_unit = 'micron'
+        sieve_data[key].calculated = True
     unit = data_dictionary['Sieve Units']
     selected_screens = data_dictionary['Selected Screen']
     selected_proppants = data_dictionary['Selected Proppant']
+    _profile_stop('load', _start, len(sieve_data), read_paths=[data_filename])
     return unit, sieve_data, selected_screens, selected_proppants
 
+def _saved_file_records(sieve_data:dict[str,SandSieveData]):
+    #yields (key, JSON dictionary) per sample. a SieveDataset converts its arrays to lists once instead of per sample
+    if isinstance(sieve_data, SieveDataset):
+        sieve_sizes = sieve_data.sieve_sizes.tolist()
+        retained = sieve_data.retained.tolist()
+        cumulative_wt_perc = sieve_data.cumulative_wt_perc.tolist()
+        depths = sieve_data.depths.tolist()
+        results = {_field: sieve_data.results[_field].tolist() for _field in sieve_result_fields}
+        for _i, _name in enumerate(sieve_data.keys()):
+            yield _name, {'Name':_name, 'Depth':depths[_i], 'Sieve Sizes':sieve_sizes,
+                          'Retained Weight':retained[_i], 'Cumulative Weight Percentage':cumulative_wt_perc[_i],
+                          **{saved_file_keys[_field]:results[_field][_i] for _field in saved_file_keys}}
+        return
+    for i in sieve_data.keys():
+        yield i, {'Name':sieve_data[i].name, 'Depth':sieve_data[i].depth, 'Sieve Sizes':sieve_data[i].sieve_sizes, 
+                  'Retained Weight':sieve_data[i].retained, 'Cumulative Weight Percentage':sieve_data[i].cumulative_wt_perc,
+                  **{saved_file_keys[_field]:getattr(sieve_data[i], _field) for _field in saved_file_keys}}
+
 def write_saved_file_json(unit, sieve_data:dict[str,SandSieveData], selected_screen:list, selected_proppant:list, data_filename:str):
+    _start = _profile_start()
     data_dictionary = {}
     data_dictionary['Sieve Units'] = unit
     data_dictionary['Selected Screen'] = selected_screen
     data_dictionary['Selected Proppant'] = selected_proppant
-    data_dictionary['SRT Results'] = {}
-    for i in sieve_data.keys():
-        data_dictionary['SRT Results'][i] = {'Name':sieve_data[i].name, 'Depth':sieve_data[i].depth, 'Sieve Sizes':sieve_data[i].sieve_sizes, 
-                            'Retained Weight':sieve_data[i].retained, 'Cumulative Weight Percentage':sieve_data[i].cumulative_wt_perc,
-                            'd5':sieve_data[i].d5, 'd10':sieve_data[i].d10, 'd40':sieve_data[i].d40, 'd50':sieve_data[i].d50, 'd90':sieve_data[i].d90, 'd95':sieve_data[i].d95,
-                            'UC':sieve_data[i].uniformity_coeff, 'Sorting':sieve_data[i].sorting_factor, 'Effective Size':sieve_data[i].effective_size,
-                            'Mobile Fines Coefficient':sieve_data[i].mobile_fines_coeff, 'Mobile Fines Size':sieve_data[i].mobile_fines_size,
-                            'Average Formation Pore Size':sieve_data[i].average_formation_pore, 'Smallest Particle to Bridge':sieve_data[i].smallest_particle_to_bridge,
-                            'Largest Particle to Pass Through':sieve_data[i].largest_particle_thru_pore}
+    data_dictionary['SRT Results'] = dict(_saved_file_records(sieve_data))
     with open(data_filename, 'w',) as file:
+        json.dump(data_dictionary, file, default=_json_default)
+    _profile_stop('save', _start, len(sieve_data), written_paths=[data_filename])
+
+def _json_default(value):
+    #numpy arrays and scalars from SieveDataset views
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _group_sieve_datasets(sieve_data:dict[str,SandSieveData]):
+    #splits samples into one SieveDataset per set of sieve sizes
+    if isinstance(sieve_data, SieveDataset):
+        return [sieve_data]
+    sieve_groups:dict[tuple,dict[str,SandSieveData]] = {}
+    for _x in sieve_data.keys():
+        sieve_groups.setdefault((sieve_data[_x].converted_unit is None, tuple(sieve_data[_x].sieve_sizes)), {})[_x] = sieve_data[_x]
+    return [SieveDataset.from_sieve_data(_group) for _group in sieve_groups.values()]
+
+def common_sieve_grid(largest_size:float=8000.0, smallest_size:float=1.0, points:int=64):
+    #log-spaced sieve sizes in microns, largest first as in the sieve files
+    return np.geomspace(largest_size, smallest_size, points)
+
+def _interp_shared_xp(x:np.ndarray, xp:np.ndarray, fp:np.ndarray):
+    #row-wise np.interp(x, xp, fp[i]) for a 2-D fp sharing one increasing xp, held constant outside xp like np.interp
+    _j = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 2)
+    _weight = np.clip((x - xp[_j]) / (xp[_j + 1] - xp[_j]), 0, 1)
+    return fp[:, _j] * (1 - _weight) + fp[:, _j + 1] * _weight
+
+def resample_sieve_data(sieve_data:dict[str,SandSieveData], sieve_grid=None):
+    #maps every cumulative curve onto one common sieve grid, interpolating in log grain size for each group of samples sharing
+    #a set of sieve sizes. the originals are not changed, the returned SieveDataset holds percent retained on the new grid
+    sieve_grid = common_sieve_grid() if sieve_grid is None else np.asarray(sieve_grid, dtype=float)
+    datasets = []
+    for dataset in _group_sieve_datasets(sieve_data):
+        if dataset.converted_unit is None:
+            raise ValueError("Sieve sizes must be converted to microns, perform calculations before resampling")
+        _order = np.argsort(dataset.sieve_sizes)
+        _cumulative = np.cumsum(dataset.retained, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            _cumulative = 100 * _cumulative / _cumulative[:, -1:]
+        cumulative_wt_perc = _interp_shared_xp(np.log(sieve_grid), np.log(dataset.sieve_sizes[_order]), _cumulative[:, _order])
+        resampled = SieveDataset(dataset.names, dataset.depths, sieve_grid, np.diff(cumulative_wt_perc, axis=1, prepend=0), cumulative_wt_perc)
+        resampled.raw_sieve_unit = resampled.converted_unit = 'micron'
+        datasets.append(resampled)
+    return SieveDataset.concatenate(datasets)
+
+def _write_dataset_npy(dataset:SieveDataset, group_dirname:str):
+    os.makedirs(group_dirname, exist_ok=True)
+    for _column, _values in [('names', dataset.names), ('depths', dataset.depths), ('sieve_sizes', dataset.sieve_sizes),
+                             ('retained', dataset.retained), ('cumulative_wt_perc', dataset.cumulative_wt_perc), *dataset.results.items(),
+                             ('calculated', dataset.calculated), ('constien_proppant', np.asarray([_x or '' for _x in dataset.constien_proppant], dtype=str))]:
+        np.save(os.path.join(group_dirname, _column + '.npy'), _values)
+    return {'Path': os.path.basename(group_dirname), 'Converted': dataset.converted_unit is not None}
+
+def _read_dataset_npy(data_dirname:str, group:dict, mmap_mode:str):
+    _load = lambda _column: np.load(os.path.join(data_dirname, group['Path'], _column + '.npy'), mmap_mode=mmap_mode)
+    results = {_field: _load(_field) for _field in sieve_result_fields + ('constien_criteria',)
+               if os.path.exists(os.path.join(data_dirname, group['Path'], _field + '.npy'))}
+    dataset = SieveDataset(_load('names'), _load('depths'), _load('sieve_sizes'), _load('retained'), _load('cumulative_wt_perc'), results)
+    if group['Converted']:
+        dataset.raw_sieve_unit = dataset.converted_unit = 'micron'
+    dataset.calculated = np.array(_load('calculated'))
+    dataset.constien_proppant[:] = [_x or None for _x in _load('constien_proppant').tolist()]
+    return dataset
+
+def write_saved_file_npy(unit, sieve_data:dict[str,SandSieveData], selected_screen:list, selected_proppant:list, data_dirname:str):
+    #binary project: a directory holding metadata.json and one .npy file per column for each set of sieve sizes
+    _start = _profile_start()
+    os.makedirs(data_dirname, exist_ok=True)
+    groups = []
+    for _i, dataset in enumerate(_group_sieve_datasets(sieve_data)):
+        groups.append(_write_dataset_npy(dataset, os.path.join(data_dirname, f"group_{_i}")))
+    data_dictionary = {'Sieve Units': unit, 'Selected Screen': selected_screen, 'Selected Proppant': selected_proppant, 'Groups': groups}
+    with open(os.path.join(data_dirname, 'metadata.json'), 'w',) as file:
+        json.dump(data_dictionary, file)
+    if _start is not None:
+        _profile_stop('save', _start, len(sieve_data), written_paths=_saved_file_npy_paths(data_dirname, groups))
+
+def append_saved_file_npy(unit, sieve_data:dict[str,SandSieveData], selected_screen:list, selected_proppant:list, data_dirname:str,
+                          source_files:list[str]=(), source_signatures:list=None):
+    #adds the samples to a binary project as new groups without rewriting the existing ones, creating the project if needed.
+    #metadata.json is replaced atomically after the new columns are written, so readers never see a partly appended group.
+    #each new group lists its source files with their (size, mtime_ns) signature, taken now unless source_signatures are given
+    _start = _profile_start()
+    _metadata_filename = os.path.join(data_dirname, 'metadata.json')
+    if os.path.exists(_metadata_filename):
+        with open(_metadata_filename, 'r',) as file:
+            data_dictionary = json.load(file)
+        if data_dictionary['Sieve Units'] != unit:
+            raise ValueError(f"Project {data_dirname} uses {data_dictionary['Sieve Units']} sieve sizes, not {unit}")
+    else:
+        os.makedirs(data_dirname, exist_ok=True)
+        data_dictionary = {'Sieve Units': unit, 'Selected Screen': selected_screen, 'Selected Proppant': selected_proppant, 'Groups': []}
+    datasets = sieve_data if isinstance(sieve_data, list) else _group_sieve_datasets(sieve_data)
+    if source_signatures is None:
+        source_signatures = [(os.stat(_file).st_size, os.stat(_file).st_mtime_ns) if os.path.exists(_file) else None for _file in source_files]
+    groups = []
+    _i = len(data_dictionary['Groups'])
+    for dataset in datasets:
+        while os.path.exists(os.path.join(data_dirname, f"group_{_i}")):       #left over from an interrupted append
+            _i += 1
+        groups.append(_write_dataset_npy(dataset, os.path.join(data_dirname, f"group_{_i}")))
+        groups[-1]['Files'] = [{'Name': os.path.basename(_file), 'Signature': list(_signature) if _signature else None}
+                               for _file, _signature in zip(source_files, source_signatures)]
+    data_dictionary['Groups'].extend(groups)
+    with open(_metadata_filename + '.tmp', 'w',) as file:
         json.dump(data_dictionary, file)
+    os.replace(_metadata_filename + '.tmp', _metadata_filename)
+    if _start is not None:
+        _profile_stop('save', _start, sum(len(dataset) for dataset in datasets), written_paths=_saved_file_npy_paths(data_dirname, groups))
+    return [_group['Path'] for _group in groups]
 
-def import_sieve_data(data_filename:str):
+def _saved_file_npy_paths(data_dirname:str, groups:list[dict]):
+    #lists the group directories, so only call it while profiling
+    return [os.path.join(data_dirname, 'metadata.json')] + [os.path.join(data_dirname, _group['Path'], _file)
+                                                            for _group in groups for _file in os.listdir(os.path.join(data_dirname, _group['Path']))]
+
+def read_saved_file_npy(data_dirname:str, mmap_mode:str='c'):
+    #columns are memory-mapped, so only the samples and columns actually used are read from disk. the default copy-on-write mode
+    #keeps recalculations and edits in memory without touching the files, mmap_mode='r' gives a read-only project.
+    #when profiling, the bytes read are the size of the mapped files
+    _start = _profile_start()
+    with open(os.path.join(data_dirname, 'metadata.json'), 'r',) as file:
+        data_dictionary = json.load(file)
+    datasets = [_read_dataset_npy(data_dirname, _group, mmap_mode) for _group in data_dictionary['Groups']]
+    if len(datasets) == 1:
+        sieve_data = datasets[0]
+    else:
+        sieve_data:dict[str,SandSieveData] = {}
+        for dataset in datasets:
+            sieve_data.update(dataset)
+    if _start is not None:
+        _profile_stop('load', _start, sum(len(dataset) for dataset in datasets), read_paths=_saved_file_npy_paths(data_dirname, data_dictionary['Groups']))
+    return data_dictionary['Sieve Units'], sieve_data, data_dictionary['Selected Screen'], data_dictionary['Selected Proppant']
+
+def convert_saved_file_json_to_npy(json_filename:str, data_dirname:str):
+    unit, sieve_data, selected_screens, selected_proppants = read_saved_file_json(json_filename)
+    write_saved_file_npy(unit, sieve_data, selected_screens, selected_proppants, data_dirname)
+
+def convert_saved_file_npy_to_json(data_dirname:str, json_filename:str):
+    unit, sieve_data, selected_screens, selected_proppants = read_saved_file_npy(data_dirname)
+    write_saved_file_json(unit, sieve_data, selected_screens, selected_proppants, json_filename)
+
+def iter_sieve_data_chunks(data_filename:str, chunk_size:int=10000):
+    #streams a sieve file as SieveDataset chunks of up to chunk_size rows. the header (sample, depth, sieve sizes) is read once.
+    #a file with a header but no samples gives one empty chunk, so it still has its sieve sizes
+    with open(data_filename, 'r',) as file:
+        _header = file.readline()
+        if not _header.strip():
+            raise ValueError(f"{data_filename} has no header of sample, depth and sieve sizes")
+        sieve_sizes = [float(_y) for _y in _header.strip().split(',')[2:]]
+        _header_bytes = len(_header)
+        _chunks = 0
+        _sample_lines = (_line for _line in file if _line.strip())     #blank lines are skipped before chunking, so only EOF ends the file
+        while True:
+            _start = _profile_start()
+            _lines = list(itertools.islice(_sample_lines, chunk_size))
+            if not _lines:
+                if not _chunks:
+                    yield SieveDataset([], [], sieve_sizes, np.zeros((0, len(sieve_sizes))))
+                break
+            _values = np.loadtxt(_lines, delimiter=',', usecols=range(1, len(sieve_sizes) + 2), dtype=float, ndmin=2)
+            sieve_chunk = SieveDataset([_line.split(',', 1)[0] for _line in _lines], _values[:, 0], sieve_sizes, _values[:, 1:])
+            if _start is not None:
+                _profile_stop('import', _start, len(_lines), _header_bytes + sum(len(_line) for _line in _lines))
+                _header_bytes = 0
+            _chunks += 1
+            yield sieve_chunk
+
+def calculate_sieve_chunks(unit, sieve_chunks, proppant_dictionary:dict, selected_proppant:str):
+    #generator pipeline: calculates each chunk as it arrives, e.g. from iter_sieve_data_chunks
+    for sieve_chunk in sieve_chunks:
+        yield calculate_sieve_results(unit, sieve_chunk, proppant_dictionary, selected_proppant)
+
+def write_saved_file_json_chunks(unit, sieve_chunks, selected_screen:list, selected_proppant:list, data_filename:str):
+    #same file as write_saved_file_json, written one chunk at a time so the whole project is never held in memory.
+    #when profiling, the save stage also includes the time spent producing the chunks
+    _start = _profile_start()
+    _samples = 0
+    with open(data_filename, 'w',) as file:
+        file.write('{"Sieve Units": ' + json.dumps(unit) + ', "Selected Screen": ' + json.dumps(selected_screen) +
+                   ', "Selected Proppant": ' + json.dumps(selected_proppant) + ', "SRT Results": {')
+        _separator = ''
+        for sieve_chunk in sieve_chunks:
+            for _key, _record in _saved_file_records(sieve_chunk):
+                file.write(_separator + json.dumps(_key) + ': ' + json.dumps(_record, default=_json_default))
+                _separator = ', '
+            _samples += len(sieve_chunk)
+        file.write('}}')
+    _profile_stop('save', _start, _samples, written_paths=[data_filename])
+
+def import_sieve_data(data_filename:str, as_dataset:bool=False):
+    if as_dataset:
+        return SieveDataset.concatenate(iter_sieve_data_chunks(data_filename))
+    _start = _profile_start()
     sieve_data_ndarray = np.genfromtxt(data_filename, delimiter=',', dtype=None, names=True, autostrip=False, deletechars="~!@#$%^&*()-=+~|]}[{';: ?>,<")  
     _x = []
     sieve_data:dict[str,SandSieveData] = {}
@@ -142,20 +726,39 @@ def import_sieve_data(data_filename:str):
         _x = sieve_data_content.tolist()
         #name, depth, sieve sizes from header names in ndarray, wt retained
         sieve_data[_x[0]] = SandSieveData(_x[0], float(_x[1]), [float(_y) for _y in sieve_data_ndarray.dtype.names[2:]], list(_x[2:]), [], 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    _profile_stop('import', _start, len(sieve_data_ndarray), read_paths=[data_filename])
     return sieve_data
 
+#parsed databases keyed by absolute path, only parsed again when the file's mtime or size changes
+_database_cache:dict[tuple,tuple] = {}
+
+def _cached_catalog(data_filename:str, build_catalog):
+    #the catalog built from a database file is kept until the file's mtime or size changes, callers share it and must not modify it
+    _path = os.path.abspath(data_filename)
+    _stat = os.stat(_path)
+    _key = (_path, build_catalog.__name__)
+    _cached = _database_cache.get(_key)
+    if _cached is None or _cached[0] != (_stat.st_mtime_ns, _stat.st_size):
+        with open(_path, 'r',) as file:
+            _cached = _database_cache[_key] = ((_stat.st_mtime_ns, _stat.st_size), build_catalog(json.load(file)))
+    return _cached[1]
+
 def import_screen_data(data_filename:str):
-    with open(data_filename, 'r',) as file:
-        data_dictionary = json.load(file)
+    #returns a ScreenCatalog, a dictionary keyed by screen name with sorted aperture lookups
+    return _cached_catalog(data_filename, _build_screen_catalog)
+
+def import_proppant_data(data_filename:str):
+    #returns a ProppantCatalog, a dictionary keyed by proppant name with the pack pore sizes precomputed and sorted D50 lookups
+    return _cached_catalog(data_filename, _build_proppant_catalog)
+
+def _build_screen_catalog(data_dictionary:dict):
     screen_dictionary:dict = {}
     _dd = data_dictionary
     for key in _dd:
         screen_dictionary[key] = {'name': _dd[key]['name'], 'type': _dd[key]['type'], 'aperture_micron': _dd[key]['aperture_micron']}
-    return screen_dictionary
+    return ScreenCatalog(screen_dictionary)
 
-def import_proppant_data(data_filename:str):    
-    with open(data_filename, 'r',) as file:
-        data_dictionary = json.load(file)
+def _build_proppant_catalog(data_dictionary:dict):
     #unit_class = UnitSystemClass(**json_data)      #assign to a class object if keys match objects
     proppant_dictionary:dict = {}
     _dd = data_dictionary
@@ -170,21 +773,338 @@ def import_proppant_data(data_filename:str):
     #for _x in range(len(data_class)):
     #    data_class[_x].calculate_proppant_parameters()
     #    proppant_dictionary[data_class[_x].name] = data_class[_x] 
-    return proppant_dictionary
+    return ProppantCatalog(proppant_dictionary)
+
+def _interp_rows(x:np.ndarray, xp:np.ndarray, fp:np.ndarray):
+    #row-wise np.interp(x, xp[i], fp) for a 2-D xp of non-decreasing rows sharing one fp, same arithmetic as np.interp
+    _rows = np.arange(xp.shape[0])
+    result = np.empty((xp.shape[0], len(x)))
+    for _k, _x in enumerate(x):
+        _j = np.count_nonzero(xp <= _x, axis=1) - 1     #last index with xp[j] <= x, as np.interp's binary search
+        _j0 = np.clip(_j, 0, xp.shape[1] - 2)
+        _xp0, _xp1 = xp[_rows, _j0], xp[_rows, _j0 + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            _slope = (fp[_j0 + 1] - fp[_j0]) / (_xp1 - _xp0)
+            _y = _slope * (_x - _xp0) + fp[_j0]
+        _y = np.where(_xp0 == _x, fp[_j0], _y)
+        _y = np.where(_j < 0, fp[0], _y)
+        _y = np.where(_j >= xp.shape[1] - 1, fp[-1], _y)
+        result[:, _k] = _y
+    return result
 
-def calculate_sieve_results(unit, sieve_data:dict[str,SandSieveData], proppant_dictionary:dict, selected_proppant:list[str]):
+def _constien_criteria(d50, uniformity_coeff, proppant_pack_pore_size:float):
+    if proppant_pack_pore_size is None:
+        return np.zeros(np.shape(d50))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return d50 / uniformity_coeff / proppant_pack_pore_size
+
+def calculate_sieve_batch(sieve_sizes, retained, proppant_pack_pore_size:float=None):
+    #vectorized calculate_sieve_results for samples sharing one set of sieve sizes, retained is (samples x sieves)
+    sieve_sizes = np.asarray(sieve_sizes, dtype=float)
+    retained = np.atleast_2d(np.asarray(retained, dtype=float))
+    _cumulative = np.cumsum(retained, axis=1)       #sequential sums, matches sum(retained[:_y+1])
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['cumulative_wt_perc'] = 100 * _cumulative / _cumulative[:, -1:]
+        #only the percentages that are kept are interpolated
+        grain_size_percent = _interp_rows(np.array([5, 10, 40, 50, 90, 95], dtype=float), results['cumulative_wt_perc'], sieve_sizes)
+        results['d5'] = grain_size_percent[:, 0]
+        results['d10'] = grain_size_percent[:, 1]
+        results['d40'] = grain_size_percent[:, 2]
+        results['d50'] = grain_size_percent[:, 3]
+        results['d90'] = grain_size_percent[:, 4]
+        results['d95'] = grain_size_percent[:, 5]
+        results['uniformity_coeff'] = results['d40'] / results['d90']
+        results['sorting_factor'] = results['d10'] / results['d95']
+        results['effective_size'] = results['d50'] / results['uniformity_coeff']
+        results['mobile_fines_coeff'] = results['d50'] / results['d95']
+        results['mobile_fines_size'] = results['d50'] / 10
+        results['average_formation_pore'] = results['d50'] / formation_pore_ratio
+        results['smallest_particle_to_bridge'] = results['average_formation_pore'] / 3
+        results['largest_particle_thru_pore'] = results['average_formation_pore'] / 7
+        results['recommended_gravel_D50'] = results['d50'] * recommended_gravel_ratio
+        results['recommended_frac_D50'] = results['d50'] * recommended_frac_ratio
+        results['constien_criteria'] = _constien_criteria(results['d50'], results['uniformity_coeff'], proppant_pack_pore_size)
+    return results
+
+def calculate_sieve_results(unit, sieve_data:dict[str,SandSieveData], proppant_dictionary:dict, selected_proppant:list[str], recalculate:bool=False):
+    #only new, modified or reconverted samples are recalculated, a change of proppant only recalculates the Constien criterion
+    if selected_proppant is not None and selected_proppant in proppant_dictionary:
+        _proppant = proppant_dictionary[selected_proppant]
+        if 'pack_pore_micron' not in _proppant:
+            _proppant = ProppantCatalog({selected_proppant: _proppant})[selected_proppant]
+        proppant_pack_pore_size = _proppant['pack_pore_micron']
+    else:
+        proppant_pack_pore_size = None
+        selected_proppant = None
+    if isinstance(sieve_data, SieveDataset):
+        sieve_data.calculate(unit, proppant_pack_pore_size, selected_proppant, recalculate)
+        return sieve_data
+    #samples sharing a set of sieve sizes are calculated together as one 2-D array
+    sieve_groups:dict[tuple,list[str]] = {}
+    constien_keys:list[str] = []
+    _start = _profile_start()
     for _x in sieve_data.keys():
-        sieve_data[_x].cumulative_wt_perc = []
         sieve_data[_x].convert_sieve_sizes(unit)
-        for _y in range(len(sieve_data[_x].retained)):
-            sieve_data[_x].cumulative_wt_perc.append(100 * sum(sieve_data[_x].retained[:_y+1]) / sum(sieve_data[_x].retained))     #y+1 is needed y is the length of the range, and we need 1 after the length for slicer
-        sieve_data[_x].calculate_sieve_parameters()
-        try:
-            sieve_data[_x].calculate_constien_criteria(proppant_dictionary[selected_proppant]['D50_micron']/6.5)
-        except:
-            sieve_data[_x].constien_criteria = 0
+        if recalculate or not sieve_data[_x].calculated:
+            sieve_groups.setdefault(tuple(sieve_data[_x].sieve_sizes), []).append(_x)
+        elif sieve_data[_x].constien_proppant != selected_proppant:
+            constien_keys.append(_x)
+    _profile_stop('convert', _start, len(sieve_data))
+    _start = _profile_start()
+    for _sizes, _keys in sieve_groups.items():
+        results = calculate_sieve_batch(_sizes, [sieve_data[_x].retained for _x in _keys], proppant_pack_pore_size)
+        results['cumulative_wt_perc'] = results['cumulative_wt_perc'].tolist()
+        for _i, _x in enumerate(_keys):
+            sieve_data[_x].cumulative_wt_perc = results['cumulative_wt_perc'][_i]
+            for _field in sieve_result_fields:
+                setattr(sieve_data[_x], _field, results[_field][_i])
+            sieve_data[_x].constien_criteria = results['constien_criteria'][_i] if proppant_pack_pore_size is not None else 0
+            sieve_data[_x].calculated = True
+            sieve_data[_x].constien_proppant = selected_proppant
+    _profile_stop('calculate', _start, sum(len(_keys) for _keys in sieve_groups.values()))
+    _start = _profile_start()
+    if constien_keys:
+        constien_criteria = _constien_criteria(np.array([sieve_data[_x].d50 for _x in constien_keys]),
+                                               np.array([sieve_data[_x].uniformity_coeff for _x in constien_keys]), proppant_pack_pore_size)
+        for _i, _x in enumerate(constien_keys):
+            sieve_data[_x].constien_criteria = constien_criteria[_i] if proppant_pack_pore_size is not None else 0
+            sieve_data[_x].constien_proppant = selected_proppant
+    _profile_stop('constien', _start, len(constien_keys))
     return sieve_data
 
+def _sieve_data_columns(sieve_data:dict[str,SandSieveData], fields:tuple):
+    #keys, depths and the requested result fields as arrays, without copying when sieve_data is a SieveDataset
+    if isinstance(sieve_data, SieveDataset):
+        return sieve_data.keys(), sieve_data.depths, {_field: sieve_data.results[_field] for _field in fields}
+    keys = list(sieve_data.keys())
+    return keys, np.array([sieve_data[_x].depth for _x in keys], dtype=float), \
+        {_field: np.array([getattr(sieve_data[_x], _field, 0) for _x in keys], dtype=float) for _field in fields}
+
+#D50/d50 bands: Saucier gravel packs from gravel_pack_band below the target ratio up to it (5 to 6), frac packs 8 to 10
+gravel_pack_band = 1.0
+frac_pack_ratio = (8, 10)
+
+def _gravel_pack_ratio(proppant_ratio, target_ratio:float):
+    return (proppant_ratio >= target_ratio - gravel_pack_band) & (proppant_ratio <= target_ratio)
+
+def _rank_selection(d10, d50, proppant_D50, screen_apertures, target_ratio:float):
+    #proppants in the gravel pack band first, each part ranked by distance of D50/d50 from the target ratio.
+    #screens ranked by the largest aperture that still retains d10
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proppant_ratio = proppant_D50[None, :] / d50[:, None]
+        proppant_rank = np.lexsort((np.abs(proppant_ratio - target_ratio), ~_gravel_pack_ratio(proppant_ratio, target_ratio)), axis=-1)
+    screen_margin = d10[:, None] - screen_apertures[None, :]
+    screen_rank = np.argsort(np.where(screen_margin >= 0, screen_margin, np.inf), axis=1, kind='stable')
+    return proppant_ratio, proppant_rank, screen_rank
+
+def calculate_selection_matrix(sieve_data:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict,
+                               target_ratio:float=6, interval:float=None):
+    #evaluates every sample against every proppant and screen in the databases as (samples x catalog) arrays
+    keys, depths, columns = _sieve_data_columns(sieve_data, ('d10', 'd50', 'uniformity_coeff'))
+    proppants, screens = _proppant_catalog(proppant_dictionary), _screen_catalog(screen_dictionary)
+    proppant_names, proppant_D50 = proppants.names, proppants.D50
+    screen_names, screen_apertures = screens.names, screens.apertures
+
+    selection = {'names': keys, 'depths': depths, 'proppant_names': proppant_names, 'screen_names': screen_names}
+    proppant_ratio, proppant_rank, screen_rank = _rank_selection(columns['d10'], columns['d50'], proppant_D50, screen_apertures, target_ratio)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        selection['D50/d50'] = proppant_ratio
+        selection['gravel_pack'] = _gravel_pack_ratio(proppant_ratio, target_ratio)
+        selection['frac_pack'] = (proppant_ratio >= frac_pack_ratio[0]) & (proppant_ratio <= frac_pack_ratio[1])
+        selection['constien_criteria'] = (columns['d50'] / columns['uniformity_coeff'])[:, None] / proppants.pack_pore_size[None, :]
+        selection['aperture/d10'] = screen_apertures[None, :] / columns['d10'][:, None]
+        selection['aperture/d50'] = screen_apertures[None, :] / columns['d50'][:, None]
+    selection['proppant_rank'] = proppant_rank
+    selection['screen_rank'] = screen_rank
+    selection['recommended_proppant'] = [proppant_names[_x] for _x in proppant_rank[:, 0]] if proppant_names else [None] * len(keys)
+    selection['recommended_screen'] = [screen_names[_x] if _x >= 0 else None for _x in screens.largest_below(columns['d10'])]
+
+    if interval is not None and len(keys):
+        #intervals of the given size from the shallowest sample, designed by DepthIndex.select
+        selection['intervals'] = DepthIndex(sieve_data, ('d10', 'd50')).select(depths.min(), depths.max(), interval, proppants, screens, target_ratio)
+    return selection
+
+class DepthIndex():
+    #sorted depth index over a sample set for depth range queries, binned statistics and selection per interval.
+    #the result columns are gathered once in depth order, so queries slice views instead of rescanning the samples
+    def __init__(self, sieve_data:dict[str,SandSieveData], fields:tuple=('d10', 'd50', 'uniformity_coeff', 'sorting_factor', 'constien_criteria')):
+        self.sieve_data = sieve_data
+        keys, depths, columns = _sieve_data_columns(sieve_data, fields)
+        self.order = np.argsort(depths, kind='stable')
+        self.depths = depths[self.order]
+        self.keys = [keys[_i] for _i in self.order]
+        self.columns = {_field: columns[_field][self.order] for _field in fields}
+
+    def rows(self, top:float, bottom:float):
+        #slice of the depth-ordered samples with top <= depth <= bottom
+        return slice(np.searchsorted(self.depths, top, side='left'), np.searchsorted(self.depths, bottom, side='right'))
+
+    def query(self, top:float, bottom:float):
+        return self.keys[self.rows(top, bottom)]
+
+    def samples(self, top:float, bottom:float):
+        return {_key: self.sieve_data[_key] for _key in self.query(top, bottom)}
+
+    def aggregate(self, top:float, bottom:float, bin_size:float, fields:tuple=None, percentiles:tuple=(10, 50, 90)):
+        #min, mean, max and percentiles of each field per bin_size interval between top and bottom. empty bins are nan
+        fields = fields or tuple(self.columns)
+        _rows = self.rows(top, bottom)
+        depths = self.depths[_rows]
+        _bins = max(1, int(np.ceil((bottom - top) / bin_size)))
+        edges = top + bin_size * np.arange(_bins + 1)
+        _starts = np.append(np.searchsorted(depths, edges[:-1], side='left'), len(depths))
+        count = np.diff(_starts)
+        _empty = count == 0
+        #reduceat only over the non-empty bins, each then runs to the start of the next non-empty bin
+        _index = _starts[:-1][~_empty]
+        statistics = {'top': edges[:-1], 'bottom': edges[1:], 'count': count}
+        for _field in fields:
+            values = self.columns[_field][_rows]
+            if not len(values):
+                statistics[_field] = {_name: np.full(_bins, np.nan) for _name in ['min', 'mean', 'max'] + [f"P{_p}" for _p in percentiles]}
+                continue
+            statistics[_field] = {_name: np.full(_bins, np.nan) for _name in ('min', 'mean', 'max')}
+            statistics[_field]['min'][~_empty] = np.minimum.reduceat(values, _index)
+            statistics[_field]['mean'][~_empty] = np.add.reduceat(values, _index) / count[~_empty]
+            statistics[_field]['max'][~_empty] = np.maximum.reduceat(values, _index)
+            for _p in percentiles:
+                statistics[_field][f"P{_p}"] = np.array([np.percentile(values[_starts[_i]:_starts[_i + 1]], _p) if count[_i] else np.nan
+                                                         for _i in range(_bins)])
+        return statistics
+
+    def select(self, top:float, bottom:float, bin_size:float, proppant_dictionary:dict, screen_dictionary:dict, target_ratio:float=6):
+        #screen and proppant ranking per bin_size interval from top, designed on the finest sand of each interval, the minimum d10 and d50.
+        #empty intervals have no recommendation. calculate_selection_matrix(interval=) uses this from the shallowest sample
+        statistics = self.aggregate(top, bottom, bin_size, ('d10', 'd50'), ())
+        proppants, screens = _proppant_catalog(proppant_dictionary), _screen_catalog(screen_dictionary)
+        proppant_names, proppant_D50 = proppants.names, proppants.D50
+        screen_names, screen_apertures = screens.names, screens.apertures
+        _d10, _d50 = statistics['d10']['min'], statistics['d50']['min']
+        selection = {'top': statistics['top'], 'bottom': statistics['bottom'], 'count': statistics['count'], 'd10': _d10, 'd50': _d50,
+                     'proppant_names': proppant_names, 'screen_names': screen_names}
+        selection['D50/d50'], selection['proppant_rank'], selection['screen_rank'] = \
+            _rank_selection(_d10, _d50, proppant_D50, screen_apertures, target_ratio)
+        selection['recommended_proppant'] = [proppant_names[_x] if _n else None for _x, _n in zip(selection['proppant_rank'][:, 0], statistics['count'])] \
+            if proppant_names else [None] * len(statistics['count'])
+        selection['recommended_screen'] = [screen_names[_x] if _n and _x >= 0 else None for _x, _n in zip(screens.largest_below(_d10), statistics['count'])]
+        return selection
+
+class PSDIndex():
+    #nearest-neighbour index over cumulative weight curves resampled to one common sieve grid. distances are the rms
+    #difference in cumulative weight percent, computed for all stored curves at once with a matrix product
+    def __init__(self, names, depths, sieve_grid, curves, labels=None, centroids=None):
+        self.names = np.asarray(names, dtype=str)
+        self.depths = np.asarray(depths, dtype=float)
+        self.sieve_grid = np.asarray(sieve_grid, dtype=float)
+        self.curves = np.asarray(curves, dtype=np.float32)
+        self.labels = labels
+        self.centroids = centroids
+        self._norms = np.einsum('ij,ij->i', self.curves, self.curves)
+
+    @classmethod
+    def from_sieve_data(cls, sieve_data:dict[str,SandSieveData], sieve_grid=None):
+        resampled = resample_sieve_data(sieve_data, sieve_grid)
+        return cls(resampled.names, resampled.depths, resampled.sieve_sizes, resampled.cumulative_wt_perc)
+
+    def _query_curves(self, samples):
+        #samples are a dict or SieveDataset of calculated samples, or curves already on sieve_grid
+        if isinstance(samples, np.ndarray):
+            return np.atleast_2d(samples).astype(np.float32)
+        return resample_sieve_data(samples, self.sieve_grid).cumulative_wt_perc.astype(np.float32)
+
+    def _distances(self, curves:np.ndarray, references:np.ndarray, reference_norms:np.ndarray):
+        _squared = reference_norms[None, :] - 2 * curves @ references.T + np.einsum('ij,ij->i', curves, curves)[:, None]
+        return np.sqrt(np.maximum(_squared, 0) / len(self.sieve_grid))
+
+    def query(self, samples, k:int=5):
+        #top k most similar stored samples for each query sample, as lists of (name, depth, distance) best first
+        _distances = self._distances(self._query_curves(samples), self.curves, self._norms)
+        k = min(k, len(self.names))
+        _nearest = np.argpartition(_distances, k - 1, axis=1)[:, :k]
+        _nearest = np.take_along_axis(_nearest, np.argsort(np.take_along_axis(_distances, _nearest, axis=1), axis=1), axis=1)
+        return [[(str(self.names[_j]), self.depths[_j].item(), _distances[_i, _j].item()) for _j in _row] for _i, _row in enumerate(_nearest)]
+
+    def cluster(self, clusters:int, iterations:int=100, seed:int=0):
+        #k-means grouping of the stored curves into grain size distribution families, k-means++ seeded
+        _random = np.random.default_rng(seed)
+        centroids = self.curves[[_random.integers(len(self.curves))]]
+        for _x in range(1, clusters):
+            _nearest = self._distances(self.curves, centroids, np.einsum('ij,ij->i', centroids, centroids)).min(axis=1) ** 2
+            _probability = _nearest / _nearest.sum() if _nearest.sum() > 0 else None
+            centroids = np.vstack([centroids, self.curves[_random.choice(len(self.curves), p=_probability)]])
+        labels = np.full(len(self.curves), -1)
+        for _x in range(iterations):
+            _labels = self._distances(self.curves, centroids, np.einsum('ij,ij->i', centroids, centroids)).argmin(axis=1)
+            if np.array_equal(_labels, labels):
+                break
+            labels = _labels
+            _counts = np.bincount(labels, minlength=clusters)
+            _order = np.argsort(labels, kind='stable')
+            _sums = np.zeros(centroids.shape)
+            _sums[_counts > 0] = np.add.reduceat(self.curves[_order], np.cumsum(_counts)[_counts > 0] - _counts[_counts > 0], axis=0)
+            centroids = np.where(_counts[:, None] > 0, _sums / np.maximum(_counts, 1)[:, None], centroids).astype(np.float32)
+        self.labels, self.centroids = labels, centroids
+        return labels
+
+    def predict(self, samples):
+        #cluster label of each query sample, after cluster
+        return self._distances(self._query_curves(samples), self.centroids, np.einsum('ij,ij->i', self.centroids, self.centroids)).argmin(axis=1)
+
+    def save(self, index_filename:str):
+        #e.g. next to the saved project file, project.json -> project_psd_index.npz
+        _clusters = {} if self.labels is None else {'labels': self.labels, 'centroids': self.centroids}
+        np.savez(index_filename, names=self.names, depths=self.depths, sieve_grid=self.sieve_grid, curves=self.curves, **_clusters)
+
+    @classmethod
+    def load(cls, index_filename:str):
+        with np.load(index_filename) as data:
+            return cls(data['names'], data['depths'], data['sieve_grid'], data['curves'],
+                       data['labels'] if 'labels' in data else None, data['centroids'] if 'centroids' in data else None)
+
+def calculate_sieve_uncertainty(sieve_data:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict, realizations:int=1000,
+                                relative_error:float=0.02, absolute_error:float=0.0, target_ratio:float=6, seed:int=None, max_values:int=20000000):
+    #Monte Carlo on the retained weights. every realization of every sample is one row of a single calculate_sieve_batch call,
+    #processed in chunks of samples holding at most max_values perturbed weights. reports P10/P50/P90 of each result and the
+    #probability that each screen retains d10 (aperture <= d10) and each proppant meets the gravel pack D50/d50 band of calculate_selection_matrix
+    _random = np.random.default_rng(seed)
+    fields = ('d5', 'd10', 'd40', 'd50', 'd90', 'd95', 'uniformity_coeff', 'sorting_factor', 'effective_size', 'mobile_fines_coeff')
+    proppants, screens = _proppant_catalog(proppant_dictionary), _screen_catalog(screen_dictionary)
+    proppant_names, proppant_D50 = proppants.names, proppants.D50
+    screen_names, screen_apertures = screens.names, screens.apertures
+    names, depths = [], []
+    percentiles = {_p: {_field: [] for _field in fields} for _p in ('P10', 'P50', 'P90')}
+    screen_probability, proppant_probability = [], []
+    for dataset in _group_sieve_datasets(sieve_data):
+        if dataset.converted_unit is None:
+            raise ValueError("Sieve sizes must be converted to microns, perform calculations before the uncertainty analysis")
+        _chunk = max(1, max_values // (realizations * len(dataset.sieve_sizes)))
+        for _start in range(0, len(dataset.names), _chunk):
+            retained = dataset.retained[_start:_start + _chunk]
+            perturbed = retained[None, :, :] * (1 + relative_error * _random.standard_normal((realizations,) + retained.shape, dtype=np.float32))
+            if absolute_error:
+                perturbed += absolute_error * _random.standard_normal(perturbed.shape, dtype=np.float32)
+            perturbed = np.maximum(perturbed, 0)
+            results = calculate_sieve_batch(dataset.sieve_sizes, perturbed.reshape(-1, retained.shape[1]))
+            for _field in fields:
+                _values = np.percentile(results[_field].reshape(realizations, -1), [10, 50, 90], axis=0)
+                for _i, _p in enumerate(('P10', 'P50', 'P90')):
+                    percentiles[_p][_field].append(_values[_i])
+            _d10 = results['d10'].reshape(realizations, -1)
+            _d50 = results['d50'].reshape(realizations, -1)
+            screen_probability.append((screen_apertures[None, None, :] <= _d10[:, :, None]).mean(axis=0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                proppant_probability.append(_gravel_pack_ratio(proppant_D50[None, None, :] / _d50[:, :, None], target_ratio).mean(axis=0))
+        names.extend(dataset.keys())
+        depths.append(dataset.depths)
+    uncertainty = {'names': names, 'depths': np.concatenate(depths) if depths else np.array([]),
+                   'screen_names': screen_names, 'proppant_names': proppant_names}
+    for _p in percentiles:
+        uncertainty[_p] = {_field: np.concatenate(percentiles[_p][_field]) if names else np.array([]) for _field in fields}
+    uncertainty['screen_retains_d10'] = np.vstack(screen_probability) if names else np.zeros((0, len(screen_names)))
+    uncertainty['proppant_meets_ratio'] = np.vstack(proppant_probability) if names else np.zeros((0, len(proppant_names)))
+    return uncertainty
+
 def print_sieve_data(sieve_data):
     keys = list(sieve_data.keys())
     print(f"Name\tDepth\t{sieve_data[keys[0]].sieve_sizes}")
@@ -198,43 +1118,58 @@ def print_sieve_analysis(sieve_data):
         print(f"{sieve_data[_x].name}\t{sieve_data[_x].depth:.2f}\t",
                 f"{sieve_data[_x].d50:.2f}\t{sieve_data[_x].uniformity_coeff:.2f}")
 
-def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict, selected_screens:list, selected_proppants:list):
-    #plots
-    fig, ax1 = plt.subplots(2,4)
-    fig.suptitle("Grain Size Distribution and Uniformity Coefficients")
-    fig.tight_layout()
-    #plt.rcParams['axes.labelsize'] = 8
-    samples = list(srt_results.keys())
-    for sample in samples:
-            ax1[0, 0].plot(srt_results[sample].sieve_sizes, srt_results[sample].retained, label=srt_results[sample].name)
-            ax1[1, 0].plot(srt_results[sample].sieve_sizes, srt_results[sample].cumulative_wt_perc)
-            ax1[0, 1].plot(srt_results[sample].uniformity_coeff, srt_results[sample].depth, marker='o', linestyle='None')
-            ax1[1, 1].plot(srt_results[sample].uniformity_coeff, srt_results[sample].d50,  marker='o', linestyle='None')
-            ax1[0, 3].plot(srt_results[sample].d10, srt_results[sample].depth, marker='o', linestyle='None')
-            ax1[1, 3].plot(6*srt_results[sample].d50, srt_results[sample].depth, marker='o', linestyle='None')
-    
-    #ax1[0, 0].plot([SandSieveData.sieve_sizes for SandSieveData in srt_results], [SandSieveData.sieve_sizes for SandSieveData in srt_results])
-
-    #ax1[0, 0].plot([srt_results[key].sieve_sizes for key in srt_results.keys()], 
-    #            [srt_results[key].retained for key in srt_results.keys()], label=srt_results[sample].name)
-
-    ax1[0, 2].plot([srt_results[key].average_formation_pore for key in srt_results.keys()], 
-                [srt_results[key].depth for key in srt_results.keys()], label="Average Formation Pore Size")
-    ax1[0, 2].plot([srt_results[key].mobile_fines_size for key in srt_results.keys()], 
-                [srt_results[key].depth for key in srt_results.keys()], label="Mobile Fines Size")
-    ax1[0, 2].plot([srt_results[key].smallest_particle_to_bridge for key in srt_results.keys()], 
-                [srt_results[key].depth for key in srt_results.keys()], label="Smallest Particle to Bridge")
-    ax1[0, 2].plot([srt_results[key].largest_particle_thru_pore for key in srt_results.keys()], 
-                [srt_results[key].depth for key in srt_results.keys()], label="Largest Particle to Pass Thru Avg Pore")
-    ax1[0, 2].plot([srt_results[key].mobile_fines_coeff for key in srt_results.keys()], 
-                [srt_results[key].depth for key in srt_results.keys()], label="Mobile Fines Coeff", marker='o', linestyle='None')
+def print_interval_statistics(statistics:dict):
+    print(f"Top\tBottom\tCount\td10 P50\td50 P50\tUC P50\tSorting P50")
+    for _i in range(len(statistics['top'])):
+        print(f"{statistics['top'][_i]:.2f}\t{statistics['bottom'][_i]:.2f}\t{statistics['count'][_i]}\t",
+              f"{statistics['d10']['P50'][_i]:.2f}\t{statistics['d50']['P50'][_i]:.2f}\t",
+              f"{statistics['uniformity_coeff']['P50'][_i]:.2f}\t{statistics['sorting_factor']['P50'][_i]:.2f}")
+
+def _plot_curves(srt_results:dict[str,SandSieveData], sample_rows, values:str):
+    #one (sieve size, value) polyline per sample, as an array when the samples share their sieve sizes
+    if isinstance(srt_results, SieveDataset):
+        _values = srt_results.retained if values == 'retained' else srt_results.cumulative_wt_perc
+        _values = _values[sample_rows]
+        return np.stack(np.broadcast_arrays(srt_results.sieve_sizes[None, :], _values), axis=-1)
+    samples = list(srt_results.values())
+    return [np.column_stack([samples[_i].sieve_sizes, getattr(samples[_i], values)]) for _i in sample_rows]
+
+def _draw_plots(fig, ax1, srt_results:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict, selected_screens:list, selected_proppants:list,
+                max_curves:int=None, shade:bool=False):
+    #each panel is drawn with one collection or scatter call for all samples instead of one plot call per sample
+    import matplotlib
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    samples, depths, columns = _sieve_data_columns(srt_results, ('d10', 'd50', 'uniformity_coeff', 'average_formation_pore', 'mobile_fines_size',
+                                                                 'smallest_particle_to_bridge', 'largest_particle_thru_pore', 'mobile_fines_coeff'))
+    _cycle = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [_cycle[_i % len(_cycle)] for _i in range(len(samples))]
+    #grain size curves may be decimated to max_curves evenly spaced samples, and shaded so overlapping curves show density
+    curve_rows = np.arange(len(samples))
+    if max_curves is not None and len(samples) > max_curves:
+        curve_rows = np.unique(np.linspace(0, len(samples) - 1, max_curves).astype(int))
+    curve_colors = [colors[_i] for _i in curve_rows]
+    curve_alpha = min(1.0, 20 / len(curve_rows)) if shade else None
+    ax1[0, 0].add_collection(LineCollection(_plot_curves(srt_results, curve_rows, 'retained'), colors=curve_colors, alpha=curve_alpha))
+    ax1[1, 0].add_collection(LineCollection(_plot_curves(srt_results, curve_rows, 'cumulative_wt_perc'), colors=curve_colors, alpha=curve_alpha))
+    ax1[0, 0].autoscale_view()
+    ax1[1, 0].autoscale_view()
+    ax1[0, 1].scatter(columns['uniformity_coeff'], depths, c=colors)
+    ax1[1, 1].scatter(columns['uniformity_coeff'], columns['d50'], c=colors)
+    ax1[0, 3].scatter(columns['d10'], depths, c=colors)
+    ax1[1, 3].scatter(6*columns['d50'], depths, c=colors)
+
+    ax1[0, 2].plot(columns['average_formation_pore'], depths, label="Average Formation Pore Size")
+    ax1[0, 2].plot(columns['mobile_fines_size'], depths, label="Mobile Fines Size")
+    ax1[0, 2].plot(columns['smallest_particle_to_bridge'], depths, label="Smallest Particle to Bridge")
+    ax1[0, 2].plot(columns['largest_particle_thru_pore'], depths, label="Largest Particle to Pass Thru Avg Pore")
+    ax1[0, 2].plot(columns['mobile_fines_coeff'], depths, label="Mobile Fines Coeff", marker='o', linestyle='None')
     
     #temporary variable to store proppant D50 for plotting
-    _proppantD50 = []
-    for proppant in selected_proppants:
-        _proppantD50.append(proppant_dictionary[proppant]['D50_micron'])
-    for sample in srt_results.keys():
-        ax1[1, 2].plot(selected_proppants, [_x/srt_results[sample].d50 for _x in _proppantD50], marker='o', linestyle='None')  
+    _proppantD50 = np.array([proppant_dictionary[proppant]['D50_micron'] for proppant in selected_proppants], dtype=float)
+    if len(selected_proppants):
+        ax1[1, 2].scatter(np.tile(selected_proppants, len(samples)), (_proppantD50[None, :] / columns['d50'][:, None]).ravel(),
+                          c=[_color for _color in colors for _proppant in selected_proppants])
 
     ax1[0, 0].set_xlabel("Grain Size")
     ax1[0, 0].xaxis.set_inverted(True)
@@ -244,10 +1179,12 @@ def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, sc
     ax1[0, 0].set_yticks(np.arange(0,11,1))
     ax1[0, 0].yaxis.set_label_position('right')
     ax1[0, 0].grid(True)
-    ax1[0, 0].legend(loc='best', fontsize=8)
+    if len(curve_rows) <= 50:
+        ax1[0, 0].legend([Line2D([], [], color=_color) for _color in curve_colors], [srt_results[samples[_i]].name for _i in curve_rows],
+                         loc='best', fontsize=8)
     for _key in wentworth_sand_classification:
         ax1[0, 0].axvline(x = wentworth_sand_classification[_key], color='gray', linestyle='dashed')
-        ax1[0, 0].annotate(xy = (wentworth_sand_classification[_key], srt_results[samples[0]].depth), text=_key, 
+        ax1[0, 0].annotate(xy = (wentworth_sand_classification[_key], depths[0]), text=_key, 
                         horizontalalignment='left', verticalalignment='top', fontsize=6, rotation=90)
 
     ax1[1, 0].set_xlabel("Grain Size")
@@ -269,7 +1206,7 @@ def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, sc
     ax1[0, 1].grid(True)
     for _key in uniformity_classification:
         ax1[0, 1].axvline(x = uniformity_classification[_key], color='gray', linestyle='dashed')
-        ax1[0, 1].annotate(xy = (uniformity_classification[_key], srt_results[samples[0]].depth), text = _key, 
+        ax1[0, 1].annotate(xy = (uniformity_classification[_key], depths[0]), text = _key, 
                           horizontalalignment = 'right', verticalalignment = 'top', fontsize = 6, rotation = 90)
 
     ax1[1, 1].set_xlabel("Uniformity Coefficient")
@@ -299,7 +1236,7 @@ def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, sc
     ax1[0, 3].grid(True)
     for _screen in selected_screens:
         ax1[0, 3].axvline(x = screen_dictionary[_screen]['aperture_micron'], color='red', linestyle="-")
-        ax1[0, 3].annotate(xy = (screen_dictionary[_screen]['aperture_micron'], srt_results[samples[0]].depth), text = screen_dictionary[_screen]['name'], 
+        ax1[0, 3].annotate(xy = (screen_dictionary[_screen]['aperture_micron'], depths[0]), text = screen_dictionary[_screen]['name'], 
                         horizontalalignment = 'right', verticalalignment = 'top', fontsize = 8, rotation = 90)
 
     ax1[1, 3].set_xlabel("6d50 and Gravel D50")
@@ -308,9 +1245,57 @@ def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, sc
     ax1[1, 3].grid(True)
     for proppant in selected_proppants:
         ax1[1, 3].axvline(x = proppant_dictionary[proppant]['D50_micron'], color='red', linestyle='-')
-        ax1[1, 3].annotate(xy = (proppant_dictionary[proppant]['D50_micron'], srt_results[samples[0]].depth), text = proppant_dictionary[proppant]['name'], 
+        ax1[1, 3].annotate(xy = (proppant_dictionary[proppant]['D50_micron'], depths[0]), text = proppant_dictionary[proppant]['name'], 
                         horizontalalignment = 'right', verticalalignment = 'top', fontsize = 8, rotation = 90)   
 
+def show_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict, selected_screens:list, selected_proppants:list,
+               max_curves:int=None, shade:bool=False):
+    import matplotlib.pyplot as plt     #imported on first plot, the calculation path does not need matplotlib
+    #plots
+    _start = _profile_start()
+    fig, ax1 = plt.subplots(2,4)
+    fig.suptitle("Grain Size Distribution and Uniformity Coefficients")
+    fig.tight_layout()
+    #plt.rcParams['axes.labelsize'] = 8
+    _draw_plots(fig, ax1, srt_results, proppant_dictionary, screen_dictionary, selected_screens, selected_proppants, max_curves, shade)
+    _profile_stop('plot', _start, len(srt_results))
     plt.show()
 
+def render_plots(srt_results:dict[str,SandSieveData], proppant_dictionary:dict, screen_dictionary:dict, selected_screens:list, selected_proppants:list,
+                 plot_filename:str, max_curves:int=None, shade:bool=False, figsize:tuple=(15.12, 9.09), dpi:int=100):
+    #headless version of show_plots, saved to png, svg or pdf by the file extension. uses a bare Figure so no display or pyplot backend is needed
+    _start = _profile_start()
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax1 = fig.subplots(2,4)
+    fig.suptitle("Grain Size Distribution and Uniformity Coefficients")
+    _draw_plots(fig, ax1, srt_results, proppant_dictionary, screen_dictionary, selected_screens, selected_proppants, max_curves, shade)
+    fig.tight_layout()
+    fig.savefig(plot_filename)
+    _profile_stop('plot', _start, len(srt_results), written_paths=[plot_filename])
+    return plot_filename
+
+def split_by_depth_interval(srt_results:dict[str,SandSieveData], interval:float):
+    #splits samples into {'top-bottom': samples} sets of the given depth interval, e.g. for export_plots
+    samples, depths, _ = _sieve_data_columns(srt_results, ())
+    _bins = np.floor(depths / interval)
+    plot_sets = {}
+    for _bin in np.unique(_bins):
+        _rows = np.flatnonzero(_bins == _bin)
+        _label = f"{_bin * interval:g}-{(_bin + 1) * interval:g}"
+        if isinstance(srt_results, SieveDataset):
+            plot_sets[_label] = srt_results.subset(_rows)
+        else:
+            plot_sets[_label] = {samples[_i]: srt_results[samples[_i]] for _i in _rows}
+    return plot_sets
 
+def export_plots(plot_sets:dict[str,dict], output_dir:str, proppant_dictionary:dict, screen_dictionary:dict, selected_screens:list, selected_proppants:list,
+                 formats:tuple=('png',), workers:int=None, max_curves:int=None, shade:bool=False):
+    #renders each named set of samples (a well, a depth interval...) to output_dir/<name>.<format> in parallel worker processes
+    import concurrent.futures
+    os.makedirs(output_dir, exist_ok=True)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_plots, plot_sets[_name], proppant_dictionary, screen_dictionary, selected_screens, selected_proppants,
+                                   os.path.join(output_dir, f"{_name}.{_format}"), max_curves, shade)
+                   for _name in plot_sets for _format in formats]
+        return [_future.result() for _future in futures]
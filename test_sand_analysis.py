@@ -0,0 +1,152 @@
+'''
+@author: Jack Charles   https://jackcharlesconsulting.com/
+'''
+
+import os
+from unittest import mock
+import pytest
+import numpy as np
+import calcs.sand_analysis as saan
+import batch_sand_analysis
+
+repo_dirname = os.path.dirname(os.path.abspath(__file__))
+sieve_data_filename = os.path.join(repo_dirname, 'sand_analysis_default_sievefile.txt')
+
+def _calculated_sieve_data():
+    sieve_data = saan.import_sieve_data(sieve_data_filename, as_dataset=True)
+    return saan.calculate_sieve_results('micron', sieve_data, {}, None)
+
+def _check_aggregate(sieve_data, top:float, bottom:float, bin_size:float):
+    statistics = saan.DepthIndex(sieve_data).aggregate(top, bottom, bin_size, ('d50',), ())
+    for _i, (_top, _bottom) in enumerate(zip(statistics['top'], statistics['bottom'])):
+        _last = _i == len(statistics['top']) - 1
+        _in_bin = (sieve_data.depths >= _top) & (sieve_data.depths <= bottom if _last else sieve_data.depths < _bottom) & (sieve_data.depths >= top)
+        _values = sieve_data.results['d50'][_in_bin]
+        assert statistics['count'][_i] == len(_values)
+        if len(_values):
+            assert np.isclose(statistics['d50']['min'][_i], _values.min())
+            assert np.isclose(statistics['d50']['mean'][_i], _values.mean())
+            assert np.isclose(statistics['d50']['max'][_i], _values.max())
+        else:
+            assert np.isnan(statistics['d50']['mean'][_i])
+    return statistics
+
+def test_aggregate_trailing_empty_bins():
+    sieve_data = _calculated_sieve_data()
+    statistics = _check_aggregate(sieve_data, 23019.25, 23160, 50)
+    assert statistics['count'][0] == len(sieve_data) and not statistics['count'][1:].any()
+
+def test_aggregate_middle_empty_bins():
+    sieve_data = _calculated_sieve_data()
+    top = sieve_data.depths.min()
+    _check_aggregate(sieve_data, top, sieve_data.depths.max() + 100, 0.5)
+    _check_aggregate(sieve_data, top - 10, sieve_data.depths.max() + 30, 7)
+
+def test_selection_prefers_gravel_pack_band():
+    sieve_data = _calculated_sieve_data()
+    proppant_dictionary = saan.import_proppant_data(os.path.join(repo_dirname, 'database_proppant.json'))
+    screen_dictionary = saan.import_screen_data(os.path.join(repo_dirname, 'database_screen.json'))
+    selection = saan.calculate_selection_matrix(sieve_data, proppant_dictionary, screen_dictionary)
+    _rows = np.arange(len(sieve_data))
+    _in_band = selection['gravel_pack'][_rows, selection['proppant_rank'][:, 0]]
+    assert np.array_equal(_in_band, selection['gravel_pack'].any(axis=1))
+
+def test_import_budget():
+    #the calculation path is imported in a fresh interpreter and must not pull in matplotlib
+    within_budget, import_time, loaded_modules = batch_sand_analysis.check_import_budget(1.0)
+    assert 'matplotlib' not in loaded_modules and 'matplotlib.pyplot' not in loaded_modules
+    assert within_budget, f"importing calcs.sand_analysis took {import_time:.3f} s"
+
+def test_chunks_skip_blank_lines(tmp_path):
+    with open(sieve_data_filename, 'r',) as file:
+        _lines = file.readlines()
+    _filename = tmp_path / 'blank_lines.txt'
+    _filename.write_text(''.join(_lines[:4]) + '\n' * 6 + ''.join(_lines[4:]) + '\n\n')
+    chunks = list(saan.iter_sieve_data_chunks(str(_filename), chunk_size=4))
+    assert all(len(_chunk) for _chunk in chunks)
+    assert list(saan.SieveDataset.concatenate(chunks).keys()) == list(saan.import_sieve_data(sieve_data_filename).keys())
+
+def test_binary_project_recalculates_after_load(tmp_path):
+    proppant_dictionary = saan.import_proppant_data(os.path.join(repo_dirname, 'database_proppant.json'))
+    sieve_data = saan.calculate_sieve_results('micron', saan.import_sieve_data(sieve_data_filename, as_dataset=True), proppant_dictionary, 'Gravel 20/40')
+    saan.write_saved_file_npy('micron', sieve_data, [], ['Gravel 20/40'], str(tmp_path / 'project'))
+    unit, loaded, selected_screens, selected_proppants = saan.read_saved_file_npy(str(tmp_path / 'project'))
+    saan.calculate_sieve_results(unit, loaded, proppant_dictionary, 'Carbolite 20/40')
+    loaded['LAN001'].retained = loaded['LAN001'].retained[::-1]
+    saan.calculate_sieve_results(unit, loaded, proppant_dictionary, 'Carbolite 20/40')
+    assert loaded['LAN001'].d50 != sieve_data['LAN001'].d50
+    _, reloaded, _, _ = saan.read_saved_file_npy(str(tmp_path / 'project'))
+    assert np.array_equal(reloaded.results['constien_criteria'], sieve_data.results['constien_criteria'])
+
+def test_interval_selection_matches_depth_index():
+    sieve_data = _calculated_sieve_data()
+    proppant_dictionary = saan.import_proppant_data(os.path.join(repo_dirname, 'database_proppant.json'))
+    screen_dictionary = saan.import_screen_data(os.path.join(repo_dirname, 'database_screen.json'))
+    intervals = saan.calculate_selection_matrix(sieve_data, proppant_dictionary, screen_dictionary, interval=10)['intervals']
+    selection = saan.DepthIndex(sieve_data).select(sieve_data.depths.min(), sieve_data.depths.max(), 10, proppant_dictionary, screen_dictionary)
+    assert intervals['recommended_proppant'] == selection['recommended_proppant']
+    assert intervals['recommended_screen'] == selection['recommended_screen']
+    assert intervals['count'].sum() == len(sieve_data)
+    assert saan.calculate_selection_matrix(sieve_data, {}, screen_dictionary, interval=10)['intervals']['recommended_proppant'] == [None] * len(intervals['count'])
+
+def test_batch_matches_per_sample_calculation():
+    #calculate_sieve_batch must give bit-identical results to SandSieveData.calculate_sieve_parameters
+    proppant_dictionary = saan.import_proppant_data(os.path.join(repo_dirname, 'database_proppant.json'))
+    for _unit in ('micron', 'mm', 'phi'):
+        sieve_data = saan.calculate_sieve_results(_unit, saan.import_sieve_data(sieve_data_filename), proppant_dictionary, 'Gravel 20/40')
+        for _sample in saan.import_sieve_data(sieve_data_filename).values():
+            _sample.convert_sieve_sizes(_unit)
+            _sample.cumulative_wt_perc = [100 * sum(_sample.retained[:_y + 1]) / sum(_sample.retained) for _y in range(len(_sample.retained))]
+            _sample.calculate_sieve_parameters()
+            _sample.calculate_constien_criteria(proppant_dictionary['Gravel 20/40']['D50_micron'] / saan.proppant_pack_pore_ratio)
+            _calculated = sieve_data[_sample.name]
+            assert list(_calculated.cumulative_wt_perc) == _sample.cumulative_wt_perc
+            for _field in saan.sieve_result_fields + ('constien_criteria',):
+                assert getattr(_calculated, _field) == getattr(_sample, _field), (_unit, _sample.name, _field)
+
+def _result_rows(sieve_data):
+    return {_key: [getattr(_sample, _field) for _field in saan.sieve_result_fields + ('constien_criteria',)] + list(_sample.sieve_sizes)
+            for _key, _sample in sieve_data.items()}
+
+def test_incremental_recalculation():
+    proppant_dictionary = saan.import_proppant_data(os.path.join(repo_dirname, 'database_proppant.json'))
+    for _as_dataset in (False, True):
+        for _unit in ('mm', 'phi'):
+            sieve_data = saan.calculate_sieve_results(_unit, saan.import_sieve_data(sieve_data_filename, _as_dataset), proppant_dictionary, 'Gravel 20/40')
+            first = _result_rows(sieve_data)
+            #calculating again neither rescales the sieve sizes nor recalculates anything
+            with mock.patch.object(saan, 'calculate_sieve_batch', wraps=saan.calculate_sieve_batch) as calculate_sieve_batch:
+                saan.calculate_sieve_results(_unit, sieve_data, proppant_dictionary, 'Gravel 20/40')
+            assert not calculate_sieve_batch.called and _result_rows(sieve_data) == first
+            #a modified sample is the only one recalculated
+            sieve_data['LAN007'].retained = list(sieve_data['LAN007'].retained)[::-1]
+            with mock.patch.object(saan, 'calculate_sieve_batch', wraps=saan.calculate_sieve_batch) as calculate_sieve_batch:
+                saan.calculate_sieve_results(_unit, sieve_data, proppant_dictionary, 'Gravel 20/40')
+            assert calculate_sieve_batch.call_count == 1 and len(calculate_sieve_batch.call_args[0][1]) == 1
+            second = _result_rows(sieve_data)
+            assert [_key for _key in first if first[_key] != second[_key]] == ['LAN007']
+            #a new proppant only changes the Constien criterion
+            with mock.patch.object(saan, 'calculate_sieve_batch', wraps=saan.calculate_sieve_batch) as calculate_sieve_batch:
+                saan.calculate_sieve_results(_unit, sieve_data, proppant_dictionary, 'Carbolite 20/40')
+            assert not calculate_sieve_batch.called
+            _constien = len(saan.sieve_result_fields)
+            for _key, _row in _result_rows(sieve_data).items():
+                assert _row[:_constien] == second[_key][:_constien] and _row[_constien + 1:] == second[_key][_constien + 1:]
+                assert _row[_constien] != second[_key][_constien]
+
+def test_catalog_cached_until_file_changes(tmp_path):
+    _filename = tmp_path / 'database_proppant.json'
+    with open(os.path.join(repo_dirname, 'database_proppant.json'), 'r',) as file:
+        _filename.write_text(file.read())
+    proppant_dictionary = saan.import_proppant_data(str(_filename))
+    assert saan.import_proppant_data(str(_filename)) is proppant_dictionary
+    _stat = os.stat(_filename)
+    os.utime(_filename, ns=(_stat.st_atime_ns, _stat.st_mtime_ns + 1_000_000_000))
+    assert saan.import_proppant_data(str(_filename)) is not proppant_dictionary
+
+def test_malformed_proppant_is_not_ignored():
+    #only a proppant missing from the database means no proppant, an entry without a D50 is an error
+    sieve_data = saan.import_sieve_data(sieve_data_filename, as_dataset=True)
+    saan.calculate_sieve_results('micron', sieve_data, {'Gravel 20/40': {'name': 'Gravel 20/40'}}, 'Carbolite 20/40')
+    with pytest.raises(KeyError):
+        saan.calculate_sieve_results('micron', sieve_data, {'Gravel 20/40': {'name': 'Gravel 20/40'}}, 'Gravel 20/40')
@@ -0,0 +1,204 @@
+'''
+@author: Jack Charles   https://jackcharlesconsulting.com/
+'''
+
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+import concurrent.futures
+import calcs.sand_analysis as saan
+
+#the proppant database is loaded once per worker process by _init_worker
+proppant_dictionary:dict = {}
+
+def _init_worker(proppant_database_filename:str):
+    global proppant_dictionary
+    proppant_dictionary = saan.import_proppant_data(proppant_database_filename)
+
+def calculate_sieve_files(sieve_files:list[str], sieve_unit:str, selected_proppant:str):
+    #imports and calculates a batch of sieve files in a worker, merged into one SieveDataset per set of sieve sizes and returned
+    #with the files it came from. files that fail to import are returned with their error instead of failing the batch
+    datasets:dict[tuple,list] = {}
+    files:dict[tuple,list] = {}
+    failed = []
+    for _file in sieve_files:
+        try:
+            dataset = saan.import_sieve_data(_file, as_dataset=True)
+            saan.calculate_sieve_results(sieve_unit, dataset, proppant_dictionary, selected_proppant)
+        except (OSError, ValueError, IndexError) as error:
+            failed.append((_file, str(error)))
+            continue
+        _key = (tuple(dataset.raw_sieve_sizes), dataset.raw_sieve_unit)
+        datasets.setdefault(_key, []).append(dataset)
+        files.setdefault(_key, []).append(_file)
+    return [(saan.SieveDataset.concatenate(datasets[_key]), files[_key]) for _key in datasets], failed
+
+def file_signature(sieve_data_filename:str):
+    _stat = os.stat(sieve_data_filename)
+    return _stat.st_size, _stat.st_mtime_ns
+
+def ingested_files(project_dirname:str):
+    #{file name: signature} of the files already appended to the project, the latest group wins, so a restarted watcher
+    #skips them unless they changed
+    _metadata_filename = os.path.join(project_dirname, 'metadata.json')
+    if not os.path.exists(_metadata_filename):
+        return {}
+    with open(_metadata_filename, 'r',) as file:
+        return {_file['Name']: tuple(_file['Signature'] or ()) for _group in json.load(file)['Groups'] for _file in _group.get('Files', [])}
+
+class SieveFolderWatcher():
+    #polls watch_dirname for new sieve files and appends their results to a binary project in batches.
+    #a file is ready once its size and mtime are unchanged over settle_polls polls, so files still being copied are not read.
+    #the queue holds at most max_pending files, when it is full the poller waits, which is the backpressure on a burst of files.
+    #a file that fails to import is tried again once it changes. a file dropped again under an ingested name with a different
+    #size or mtime is ingested again, and its new group replaces the earlier samples of the same name when the project is read
+    def __init__(self, watch_dirname:str, project_dirname:str, proppant_database_filename:str, sieve_unit:str='micron',
+                 selected_screens:list=None, selected_proppants:list=None, workers:int=None, batch_size:int=20, max_pending:int=100,
+                 poll_interval:float=1.0, settle_polls:int=2, idle_exit:float=None, max_files:int=None, patterns:tuple=('*.txt', '*.csv')):
+        self.watch_dirname = watch_dirname
+        self.project_dirname = project_dirname
+        self.proppant_database_filename = proppant_database_filename
+        self.sieve_unit = sieve_unit
+        self.selected_screens = selected_screens or []
+        self.selected_proppants = selected_proppants or []
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.settle_polls = settle_polls
+        self.idle_exit = idle_exit
+        self.max_files = max_files
+        self.patterns = patterns
+        self.seen = ingested_files(project_dirname)
+        self.ingested:list[str] = []
+        self.failed:list[tuple] = []
+        self.samples = 0
+        self._signatures:dict[str,tuple] = {}       #file: (size, mtime), number of polls it has been unchanged
+        self._failed_signatures:dict[str,tuple] = {}
+        self._queued_signatures:dict[str,tuple] = {}
+        self._queued_total = 0
+        self._queued = 0
+        self._last_activity = time.monotonic()
+
+    def _poll(self):
+        #files whose signature did not change over the last settle_polls polls
+        ready, signatures = [], {}
+        for _file in sorted(set(_x for _pattern in self.patterns for _x in glob.glob(os.path.join(self.watch_dirname, _pattern)))):
+            try:
+                _signature = file_signature(_file)
+            except OSError:
+                continue
+            if self.seen.get(os.path.basename(_file)) == _signature:
+                continue
+            if self._failed_signatures.get(_file) == _signature:
+                continue
+            _previous, _polls = self._signatures.get(_file, (None, 0))
+            signatures[_file] = (_signature, _polls + 1 if _signature == _previous and _signature[0] else 1)
+            if signatures[_file][1] >= self.settle_polls:
+                ready.append(_file)
+        self._signatures = signatures
+        return ready
+
+    def _done(self):
+        if self.max_files is not None and len(self.ingested) + len(self.failed) >= self.max_files:
+            return True
+        return self.idle_exit is not None and not self._queued and time.monotonic() - self._last_activity >= self.idle_exit
+
+    async def _watch(self, queue:asyncio.Queue, stop:asyncio.Event):
+        while not stop.is_set():
+            for _file in self._poll():
+                if self.max_files is not None and self._queued_total >= self.max_files:
+                    break
+                if os.path.basename(_file) in self.seen:
+                    print(f"{_file} changed since it was ingested, ingesting it again")
+                self.seen[os.path.basename(_file)] = self._queued_signatures[_file] = self._signatures[_file][0]
+                self._queued_total += 1
+                self._queued += 1
+                self._last_activity = time.monotonic()
+                await queue.put(_file)
+            if self._done():
+                stop.set()
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _calculate(self, queue:asyncio.Queue, executor:concurrent.futures.Executor, store_lock:asyncio.Lock, stop:asyncio.Event):
+        #takes the next file and whatever else is already queued, up to batch_size, as one batch
+        loop = asyncio.get_running_loop()
+        while not (stop.is_set() and queue.empty()):
+            try:
+                batch = [await asyncio.wait_for(queue.get(), self.poll_interval)]
+            except asyncio.TimeoutError:
+                continue
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            datasets, failed = await loop.run_in_executor(executor, calculate_sieve_files, batch, self.sieve_unit,
+                                                          self.selected_proppants[0] if self.selected_proppants else None)
+            async with store_lock:
+                for dataset, _files in datasets:
+                    _groups = await asyncio.to_thread(saan.append_saved_file_npy, self.sieve_unit, [dataset], self.selected_screens,
+                                                      self.selected_proppants, self.project_dirname, _files,
+                                                      [self._queued_signatures.pop(_file) for _file in _files])
+                    self.samples += len(dataset)
+                    self.ingested.extend(_files)
+                    print(f"Appended {len(dataset)} samples from {len(_files)} files to {self.project_dirname} as {_groups[0]}")
+                for _file, _error in failed:
+                    self.failed.append((_file, _error))
+                    self.seen.pop(os.path.basename(_file), None)
+                    self._queued_signatures.pop(_file, None)
+                    try:
+                        self._failed_signatures[_file] = file_signature(_file)
+                    except OSError:
+                        pass
+                    print(f"Could not import {_file}: {_error}")
+            self._queued -= len(batch)
+            self._last_activity = time.monotonic()
+            if self._done():
+                stop.set()
+
+    async def run(self):
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        store_lock = asyncio.Lock()
+        stop = asyncio.Event()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                    initargs=(self.proppant_database_filename,)) as executor:
+            await asyncio.gather(self._watch(queue, stop), *[self._calculate(queue, executor, store_lock, stop) for _x in range(self.workers)])
+        return self.ingested, self.failed
+
+def main(argv:list[str]=None):
+    parser = argparse.ArgumentParser(description="Watch a directory for new sand sieve files and append their results to a binary project")
+    parser.add_argument('watch_dir', help="directory the lab drops sieve files into")
+    parser.add_argument('-o', '--project', default='watch_project', help="binary project directory, created or appended to")
+    parser.add_argument('--proppant-database', default='util/database_proppant.json')
+    parser.add_argument('--unit', default='micron', help="micron, mm, in, phi, mesh")
+    parser.add_argument('--screen', action='append', default=[], help="selected screen stored in a new project, may be repeated")
+    parser.add_argument('--proppant', action='append', default=[], help="selected proppant, may be repeated. the first is used for the Constien criterion")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes, defaults to the number of CPUs")
+    parser.add_argument('--batch-size', type=int, default=20, help="most files calculated and appended together")
+    parser.add_argument('--max-pending', type=int, default=100, help="most ready files waiting for a worker before polling pauses")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="seconds between directory scans")
+    parser.add_argument('--settle-polls', type=int, default=2, help="scans a file's size and mtime must stay unchanged before it is read")
+    parser.add_argument('--idle-exit', type=float, metavar='SECONDS', help="stop after SECONDS without new files")
+    parser.add_argument('--max-files', type=int, help="stop after this many files")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.watch_dir):
+        parser.error(f"{args.watch_dir} is not a directory")
+    watcher = SieveFolderWatcher(args.watch_dir, args.project, args.proppant_database, args.unit, args.screen, args.proppant, args.workers,
+                                 args.batch_size, args.max_pending, args.poll_interval, args.settle_polls, args.idle_exit, args.max_files)
+    try:
+        ingested, failed = asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        ingested, failed = watcher.ingested, watcher.failed
+    print(f"Ingested {watcher.samples} samples from {len(ingested)} files into {args.project}, {len(failed)} files failed")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()